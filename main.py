@@ -173,7 +173,8 @@ async def startup_event():
     # Проверяем подключение к YDB при старте (lazy инициализация при первом запросе)
     try:
         logger.info("🔍 Проверка сервисов...")
-        get_agent_service()
+        # Компилируем основной граф и открываем пул checkpointer до первого сообщения
+        await get_agent_service().warm_up()
         logger.success("✅ Все сервисы готовы")
     except Exception as e:
         logger.warning(f"⚠️ Предупреждение при инициализации сервисов: {str(e)}")
@@ -194,6 +195,12 @@ async def shutdown_event():
                 await application.bot.delete_webhook()
         except Exception as e:
             logger.warning(f"Ошибка при остановке: {str(e)}")
+    
+    # Закрываем общий пул соединений checkpointer
+    try:
+        await get_agent_service().aclose()
+    except Exception as e:
+        logger.warning(f"Ошибка при закрытии пула checkpointer: {str(e)}")
     logger.success("✅ Бот остановлен")
 
 @app.get("/", tags=["Root"])
@@ -1,6 +1,7 @@
 """
 Базовый класс для агентов (Responses API)
 """
+import copy
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 from ..graph.utils import dicts_to_messages
@@ -18,7 +19,8 @@ class BaseAgent:
         langgraph_service,
         instruction: str,
         tools: list = None,
-        agent_name: str = None
+        agent_name: str = None,
+        parallel_tools: bool = False
     ):
         self.langgraph_service = langgraph_service
         self.instruction = instruction
@@ -38,6 +40,10 @@ class BaseAgent:
         # Используем конфигурацию из langgraph_service для избежания дублирования
         from ..services.responses_api.config import ResponsesAPIConfig
         config = langgraph_service.config if hasattr(langgraph_service, 'config') else ResponsesAPIConfig()
+        if parallel_tools:
+            # Общую конфигурацию не меняем: параллельный режим нужен только этому агенту
+            config = copy.copy(config)
+            config.parallel_tools = True
         
         # Создаём orchestrator с общей конфигурацией
         self.orchestrator = ResponsesOrchestrator(
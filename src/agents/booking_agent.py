@@ -1,6 +1,7 @@
 """
 Агент для обработки бронирований
 """
+import asyncio
 from typing import Dict, Any, Optional, List
 from .base_agent import BaseAgent
 from ..services.langgraph_service import LangGraphService
@@ -31,7 +32,7 @@ class BookingAgent(BaseAgent):
             agent_name="Агент бронирования"
         )
     
-    def process_booking(self, state: ConversationState, checkpointer) -> ConversationState:
+    async def process_booking(self, state: ConversationState, checkpointer) -> ConversationState:
         """
         Обработка бронирования через граф состояний
         
@@ -102,7 +103,8 @@ class BookingAgent(BaseAgent):
             # 2. Объединит его с переданным graph_state (переданное имеет приоритет)
             # 3. Выполнит граф
             # 4. Сохранит обновленное состояние обратно в checkpointer
-            result_state = booking_graph.invoke(graph_state, config=config)
+            # ainvoke: slot_manager - асинхронный узел, синхронные узлы LangGraph выполняет в пуле потоков
+            result_state = await booking_graph.ainvoke(graph_state, config=config)
             
             # Извлекаем обновленное состояние
             updated_booking_state = result_state.get("booking", booking_state)
@@ -144,8 +146,10 @@ class BookingAgent(BaseAgent):
         """
         Выполнение запроса к агенту (совместимость со старым API)
         
-        Этот метод создает ConversationState и вызывает process_booking,
-        затем возвращает только answer для совместимости со старым кодом.
+        Этот метод создает ConversationState, открывает собственный checkpointer
+        PostgreSQL и выполняет process_booking через asyncio.run, затем возвращает
+        только answer для совместимости со старым кодом. Вызывать только вне
+        работающего event loop - из асинхронного кода используйте process_booking.
         
         Args:
             message: Сообщение пользователя
@@ -194,8 +198,14 @@ class BookingAgent(BaseAgent):
             "used_tools": None
         }
         
-        # Обрабатываем через граф
-        result_state = self.process_booking(state)
+        # Обрабатываем через граф с checkpointer на время одного вызова
+        from ..storage.checkpointer import get_postgres_checkpointer
+        
+        async def _run() -> ConversationState:
+            async with get_postgres_checkpointer() as checkpointer:
+                return await self.process_booking(state, checkpointer=checkpointer)
+        
+        result_state = asyncio.run(_run())
         
         # Возвращаем только answer для совместимости
         return result_state.get("answer", "")
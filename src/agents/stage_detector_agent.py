@@ -46,9 +46,15 @@ The main task is to understand which agent the most recent message belongs to!!!
         """
         Переопределение метода run() для stage_detector
         Напоминание добавляется в orchestrator перед последним сообщением пользователя
+        
+        Помимо полей BaseAgent.run() возвращает "stage" - стадию, распознанную из того же
+        ответа модели (без повторного запроса, как в detect_stage)
         """
         # Вызываем родительский метод - напоминание будет добавлено в orchestrator
-        return super().run(message, history, chat_id=chat_id)
+        result = super().run(message, history, chat_id=chat_id)
+        if not result.get("call_manager"):
+            result["stage"] = self._detection_from_reply(result.get("reply", "")).stage
+        return result
     
     def detect_stage(self, message: str, history: Optional[List[Dict[str, Any]]] = None, chat_id: Optional[str] = None) -> StageDetection:
         """Определение стадии диалога"""
@@ -59,6 +65,10 @@ The main task is to understand which agent the most recent message belongs to!!!
         
         logger.debug(f"Получен ответ от агента определения стадии: {response[:200] if response else 'None/Empty'}")
         
+        return self._detection_from_reply(response)
+    
+    def _detection_from_reply(self, response: str) -> StageDetection:
+        """Распознает и валидирует стадию по ответу модели"""
         # Парсим ответ
         detection = self._parse_response(response)
         
@@ -7,6 +7,7 @@ from ....common.thread import Thread
 
 from ..common.yclients_service import YclientsService
 from .logic import cancel_booking_logic
+from ..find_slots.cache import slots_cache
 
 try:
     from ....services.logger_service import logger
@@ -47,6 +48,8 @@ class CancelBooking(BaseModel):
             )
             
             if result.get('success'):
+                # Освободился слот - сбрасываем кэш свободных слотов (услуга записи здесь неизвестна)
+                slots_cache.invalidate()
                 return result.get('message', 'Запись успешно отменена')
             else:
                 error = result.get('error', 'Неизвестная ошибка')
@@ -6,6 +6,7 @@ import asyncio
 import aiohttp
 import json
 import os
+from contextlib import asynccontextmanager
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel, Field
 from .api_retry import retry_with_backoff
@@ -53,14 +54,24 @@ class YclientsService:
     
     BASE_URL = "https://api.yclients.com/api/v1"
     
-    def __init__(self, auth_header: Optional[str] = None, company_id: Optional[str] = None):
+    def __init__(
+        self,
+        auth_header: Optional[str] = None,
+        company_id: Optional[str] = None,
+        session: Optional[aiohttp.ClientSession] = None
+    ):
         """
         Инициализация сервиса
         
         Args:
             auth_header: Заголовок авторизации для API (если None, берется из переменных окружения)
             company_id: ID компании в Yclients (если None, берется из переменных окружения)
+            session: Общая HTTP-сессия (опционально). Позволяет переиспользовать соединения
+                (keep-alive) между запросами. Сессия привязана к своему event loop, поэтому
+                передавать ее можно только сервису, который используется в том же loop.
+                Если не указана, на каждый запрос создается временная сессия.
         """
+        self._session = session
         # Локально используем AUTH_HEADER и COMPANY_ID из .env
         # В облаке используем AuthenticationToken и CompanyID
         self.auth_header = auth_header or os.getenv('AUTH_HEADER') or os.getenv('AuthenticationToken')
@@ -71,6 +82,15 @@ class YclientsService:
         if not self.company_id:
             raise ValueError("Не задан COMPANY_ID или CompanyID в переменных окружения")
     
+    @asynccontextmanager
+    async def _session_scope(self):
+        """Возвращает общую сессию, если она задана и открыта, иначе временную"""
+        if self._session is not None and not self._session.closed:
+            yield self._session
+        else:
+            async with aiohttp.ClientSession() as session:
+                yield session
+    
     async def get_service_details(self, service_id: int) -> ServiceDetails:
         """
         Получить детали услуги
@@ -89,7 +109,7 @@ class YclientsService:
         }
         
         async def _fetch_service_details():
-            async with aiohttp.ClientSession() as session:
+            async with self._session_scope() as session:
                 async with session.get(url, headers=headers) as response:
                     response.raise_for_status()
                     response_data = await response.json()
@@ -133,7 +153,7 @@ class YclientsService:
         }
         
         async def _fetch_book_times():
-            async with aiohttp.ClientSession() as session:
+            async with self._session_scope() as session:
                 async with session.get(url, headers=headers, params=params) as response:
                     response.raise_for_status()
                     response_data = await response.json()
@@ -172,7 +192,7 @@ class YclientsService:
             "Content-Type": "application/json"
         }
         
-        async with aiohttp.ClientSession() as session:
+        async with self._session_scope() as session:
             async with session.get(url, headers=headers) as response:
                 response.raise_for_status()
                 response_data = await response.json()
@@ -228,7 +248,7 @@ class YclientsService:
             "comment": "ИИ Администратор"
         }
         
-        async with aiohttp.ClientSession() as session:
+        async with self._session_scope() as session:
             async with session.post(url, headers=headers, json=body) as response:
                 response_text = await response.text()
                 
@@ -275,7 +295,7 @@ class YclientsService:
             h = extract_digits(hay)[-10:]
             return n and h and n == h
         
-        async with aiohttp.ClientSession() as session:
+        async with self._session_scope() as session:
             while page <= MAX_PAGES:
                 req_body = {
                     "page": page,
@@ -341,7 +361,7 @@ class YclientsService:
             "count": str(count)
         }
         
-        async with aiohttp.ClientSession() as session:
+        async with self._session_scope() as session:
             async with session.get(url, headers=headers, params=params) as response:
                 response.raise_for_status()
                 response_data = await response.json()
@@ -399,7 +419,7 @@ class YclientsService:
             "Content-Type": "application/json"
         }
         
-        async with aiohttp.ClientSession() as session:
+        async with self._session_scope() as session:
             async with session.delete(url, headers=headers) as response:
                 response_text = await response.text()
                 
@@ -468,7 +488,7 @@ class YclientsService:
             "save_if_busy": 1 if save_if_busy else 0
         }
         
-        async with aiohttp.ClientSession() as session:
+        async with self._session_scope() as session:
             async with session.put(url, headers=headers, json=body) as response:
                 response_text = await response.text()
                 
@@ -526,7 +546,7 @@ class YclientsService:
             "Content-Type": "application/json"
         }
         
-        async with aiohttp.ClientSession() as session:
+        async with self._session_scope() as session:
             async with session.get(url, headers=headers) as response:
                 response.raise_for_status()
                 response_data = await response.json()
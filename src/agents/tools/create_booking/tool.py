@@ -8,6 +8,7 @@ from ....common.thread import Thread
 
 from ..common.yclients_service import YclientsService
 from .logic import create_booking_logic
+from ..find_slots.cache import slots_cache
 
 try:
     from ....services.logger_service import logger
@@ -69,6 +70,10 @@ class CreateBooking(BaseModel):
                 )
             )
             
+            if result.get('success'):
+                # Слот занят - сбрасываем закэшированные свободные слоты услуги
+                slots_cache.invalidate(self.service_id)
+            
             return result.get('message', 'Неизвестная ошибка')
             
         except ValueError as e:
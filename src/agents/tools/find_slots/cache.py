@@ -0,0 +1,273 @@
+"""
+Кэш результатов поиска слотов (TTL + LRU)
+
+Свободные слоты меняются не так часто, поэтому одинаковый запрос к YClients
+(услуга, мастер, дата, период), сделанный несколько секунд назад, можно
+переиспользовать. Для шага "предложить слоты" допустимая устарелость больше,
+для проверки конкретного времени - меньше. После создания, отмены или переноса
+записи кэш сбрасывается.
+
+Одинаковые запросы, которые выполняются одновременно (например, проверка времени
+в нескольких чатах), объединяются: к YClients уходит один запрос, остальные
+вызовы ждут его результат.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from ..common.yclients_service import YclientsService
+from .logic import find_slots_by_period, _time_to_minutes
+
+# Время жизни записей (секунды)
+PROPOSE_TTL = 10.0
+VERIFY_TTL = 3.0
+# Расписание одного мастера на день для проверки конкретного времени
+DAY_TIMES_TTL = 5.0
+# Название услуги меняется редко и не зависит от записей клиентов
+SERVICE_DETAILS_TTL = 300.0
+
+
+class SlotsCache:
+    """
+    Потокобезопасный кэш с ограничением по времени жизни и количеству записей
+    
+    Используется обычная блокировка, а не asyncio.Lock: инструмент FindSlots вызывается
+    через asyncio.run из разных потоков, и каждый вызов работает в своем event loop.
+    Операции с кэшем синхронные и короткие, поэтому блокировка не задерживает loop.
+    """
+    
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Растет при каждом сбросе: по нему загрузка, начатая до создания, отмены
+        # или переноса записи, узнает, что ее результат устарел
+        self.generation = 0
+    
+    def get(self, key: Hashable, ttl: float) -> Optional[Dict[str, Any]]:
+        """
+        Возвращает закэшированный результат, если он моложе ttl секунд
+        
+        Args:
+            key: Ключ запроса
+            ttl: Максимальный допустимый возраст записи для этого вызова
+        
+        Returns:
+            Результат find_slots_by_period или None
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            timestamp, payload = entry
+            if time.monotonic() - timestamp > ttl:
+                return None
+            self._data.move_to_end(key)
+            return payload
+    
+    def set(self, key: Hashable, payload: Dict[str, Any], generation: Optional[int] = None) -> None:
+        """
+        Сохраняет результат, вытесняя самые старые записи при переполнении
+        
+        Args:
+            key: Ключ запроса
+            payload: Результат запроса
+            generation: Значение generation до начала запроса. Если с тех пор кэш
+                сбрасывали, результат мог устареть и не сохраняется
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (time.monotonic(), payload)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def invalidate(self, service_id: Optional[int] = None) -> None:
+        """
+        Сбрасывает кэш и увеличивает generation
+        
+        Args:
+            service_id: Если указан, удаляются только записи этой услуги, иначе весь кэш
+        """
+        with self._lock:
+            self.generation += 1
+            if service_id is None:
+                self._data.clear()
+                return
+            for key in [key for key in self._data if key[0] == service_id]:
+                del self._data[key]
+
+
+# Глобальный экземпляр кэша
+slots_cache = SlotsCache()
+
+# Выполняющиеся запросы: (event loop, ключ запроса, generation) -> Future с результатом.
+# Future привязан к своему loop, поэтому объединяются только вызовы из одного loop.
+# Вызов, начатый после сброса кэша, не присоединяется к запросу, начатому до него
+_inflight: Dict[tuple, asyncio.Future] = {}
+
+
+async def _fetch_coalesced(key: Hashable, generation: int, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Выполняет запрос, объединяя его с таким же уже выполняющимся запросом
+    
+    Args:
+        key: Ключ запроса
+        generation: slots_cache.generation, прочитанный вызывающим до запроса
+        fetch: Функция, создающая корутину запроса
+    
+    Returns:
+        Результат fetch (общий для всех объединенных вызовов)
+    """
+    loop = asyncio.get_running_loop()
+    inflight_key = (loop, key, generation)
+    pending = _inflight.get(inflight_key)
+    if pending is not None:
+        try:
+            # shield: отмена ожидающего вызова не должна отменять общий запрос
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            # Если отменен вызов, начавший запрос, а не этот, - выполняем запрос сами
+            if not pending.cancelled() or asyncio.current_task().cancelling():
+                raise
+            return await _fetch_coalesced(key, generation, fetch)
+    
+    future = loop.create_future()
+    _inflight[inflight_key] = future
+    try:
+        result = await fetch()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Помечаем исключение как полученное, если ожидающих вызовов не было
+        future.exception()
+        raise
+    else:
+        future.set_result(result)
+    finally:
+        _inflight.pop(inflight_key, None)
+    return result
+
+
+async def find_slots_by_period_cached(
+    yclients_service: YclientsService,
+    service_id: int,
+    time_period: str,
+    master_name: Optional[str] = None,
+    master_id: Optional[int] = None,
+    date: Optional[str] = None,
+    date_range: Optional[str] = None,
+    ttl: float = PROPOSE_TTL
+) -> Dict[str, Any]:
+    """
+    find_slots_by_period с кэшированием результата
+    
+    Результаты с ошибкой не кэшируются. Если такой же запрос уже выполняется
+    в этом event loop, вызов дожидается его результата вместо нового запроса
+    к YClients. Возвращаемый словарь общий для всех попаданий в кэш, его нельзя изменять.
+    
+    Args:
+        ttl: Допустимый возраст закэшированного результата (секунды)
+        Остальные аргументы - как у find_slots_by_period
+    
+    Returns:
+        Результат find_slots_by_period
+    """
+    key = (service_id, master_id or 0, master_name or "", date or "", date_range or "", time_period or "")
+    cached = slots_cache.get(key, ttl)
+    if cached is not None:
+        return cached
+    
+    # Поколение читаем до запроса: если во время него запись создали, отменили
+    # или перенесли, результат не кэшируется
+    generation = slots_cache.generation
+    result = await _fetch_coalesced(key, generation, lambda: find_slots_by_period(
+        yclients_service=yclients_service,
+        service_id=service_id,
+        time_period=time_period,
+        master_name=master_name,
+        master_id=master_id,
+        date=date,
+        date_range=date_range
+    ))
+    if not result.get("error"):
+        slots_cache.set(key, result, generation)
+    return result
+
+
+async def is_waitlist_service(
+    yclients_service: YclientsService,
+    service_id: int,
+    ttl: float = SERVICE_DETAILS_TTL
+) -> bool:
+    """
+    Проверяет, является ли услуга "Листом ожидания" (на нее нет свободного времени)
+    
+    Для такой услуги find_slots_by_period всегда возвращает пустой список мастеров,
+    поэтому проверка по book_times должна учитывать то же правило. Ошибки API пробрасываются.
+    
+    Args:
+        yclients_service: Экземпляр сервиса Yclients
+        service_id: ID услуги
+        ttl: Допустимый возраст закэшированного результата (секунды)
+    
+    Returns:
+        True, если услуга - "Лист ожидания"
+    """
+    key = (service_id, "is_waitlist")
+    cached = slots_cache.get(key, ttl)
+    if cached is not None:
+        return cached
+    
+    generation = slots_cache.generation
+    service_details = await _fetch_coalesced(key, generation, lambda: yclients_service.get_service_details(service_id))
+    is_waitlist = (service_details.name or service_details.title) == "Лист ожидания"
+    slots_cache.set(key, is_waitlist, generation)
+    return is_waitlist
+
+
+async def get_master_day_times(
+    yclients_service: YclientsService,
+    service_id: int,
+    master_id: int,
+    date: str,
+    ttl: float = DAY_TIMES_TTL
+) -> Dict[int, str]:
+    """
+    Свободные начала записи мастера на дату - для проверки конкретного времени
+    
+    В отличие от find_slots_by_period, делает один запрос book_times без загрузки
+    деталей услуги и без объединения слотов в интервалы. Ошибки API пробрасываются.
+    Возвращаемый словарь общий для всех попаданий в кэш, его нельзя изменять.
+    
+    Args:
+        yclients_service: Экземпляр сервиса Yclients
+        service_id: ID услуги
+        master_id: ID мастера
+        date: Дата в формате "YYYY-MM-DD"
+        ttl: Допустимый возраст закэшированного результата (секунды)
+    
+    Returns:
+        Словарь {минуты от начала дня: "HH:MM"}, упорядоченный по времени
+    """
+    # Первый элемент ключа - service_id, чтобы invalidate(service_id) сбрасывал и эти записи
+    key = (service_id, master_id, date, "book_times")
+    cached = slots_cache.get(key, ttl)
+    if cached is not None:
+        return cached
+    
+    generation = slots_cache.generation
+    response = await _fetch_coalesced(key, generation, lambda: yclients_service.get_book_times(
+        master_id=master_id,
+        date=date,
+        service_id=service_id
+    ))
+    day_times = {_time_to_minutes(slot.time): slot.time for slot in response.data}
+    day_times = dict(sorted(day_times.items()))
+    slots_cache.set(key, day_times, generation)
+    return day_times
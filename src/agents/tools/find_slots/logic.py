@@ -210,6 +210,45 @@ def _generate_date_list(start_date: str, end_date: str) -> List[str]:
     return dates
 
 
+# Максимум одновременных запросов book_times к YClients: поиск без даты проверяет
+# 10 дней по всем мастерам услуги, и без ограничения это десятки запросов разом (429)
+_MAX_CONCURRENT_BOOK_TIMES = 8
+
+
+async def _fetch_book_times(
+    yclients_service: YclientsService,
+    service_id: int,
+    dates: List[str],
+    master_ids: List[int]
+) -> list:
+    """
+    Параллельно запрашивает слоты для всех пар (дата, мастер) с ограничением числа одновременных запросов
+    
+    Args:
+        yclients_service: Экземпляр сервиса Yclients
+        service_id: ID услуги
+        dates: Даты в формате "YYYY-MM-DD"
+        master_ids: ID мастеров
+        
+    Returns:
+        Ответы get_book_times (или исключения) в порядке: для каждой даты - по всем мастерам
+    """
+    semaphore = asyncio.Semaphore(_MAX_CONCURRENT_BOOK_TIMES)
+    
+    async def _fetch(check_date: str, master_id: int):
+        async with semaphore:
+            return await yclients_service.get_book_times(
+                master_id=master_id,
+                date=check_date,
+                service_id=service_id
+            )
+    
+    return await asyncio.gather(
+        *(_fetch(check_date, master_id) for check_date in dates for master_id in master_ids),
+        return_exceptions=True
+    )
+
+
 async def find_slots_by_period(
     yclients_service: YclientsService,
     service_id: int,
@@ -339,18 +378,7 @@ async def find_slots_by_period(
             check_date = today + timedelta(days=i)
             dates_to_check.append(check_date.strftime("%Y-%m-%d"))
     
-    tasks = []
-    for check_date in dates_to_check:
-        for master_id in master_ids:
-            tasks.append(
-                yclients_service.get_book_times(
-                    master_id=master_id,
-                    date=check_date,
-                    service_id=service_id
-                )
-            )
-    
-    responses = await asyncio.gather(*tasks, return_exceptions=True)
+    responses = await _fetch_book_times(yclients_service, service_id, dates_to_check, master_ids)
     
     # Храним слоты по мастерам: master_slots[master_id][date] = set()
     master_slots = {}
@@ -554,18 +582,7 @@ async def find_alternative_masters_slots(
             dates_to_check.append(check_date.strftime("%Y-%m-%d"))
     
     # Параллельно запрашиваем слоты для всех мастеров
-    tasks = []
-    for check_date in dates_to_check:
-        for master_id in master_ids:
-            tasks.append(
-                yclients_service.get_book_times(
-                    master_id=master_id,
-                    date=check_date,
-                    service_id=service_id
-                )
-            )
-    
-    responses = await asyncio.gather(*tasks, return_exceptions=True)
+    responses = await _fetch_book_times(yclients_service, service_id, dates_to_check, master_ids)
     
     # Храним слоты по мастерам: master_slots[master_id][date] = set()
     master_slots = {}
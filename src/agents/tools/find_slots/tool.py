@@ -8,7 +8,8 @@ from pydantic import BaseModel, Field
 from ....common.thread import Thread
 
 from ..common.yclients_service import YclientsService
-from .logic import find_slots_by_period, _is_generic_master_term, find_alternative_masters_slots
+from .logic import _is_generic_master_term, find_alternative_masters_slots
+from .cache import find_slots_by_period_cached, PROPOSE_TTL
 
 try:
     from ....services.logger_service import logger
@@ -19,6 +20,14 @@ except ImportError:
     logger = SimpleLogger()
 
 
+def _format_date(date: str) -> str:
+    """Переводит дату "YYYY-MM-DD" в "DD.MM.YYYY" (некорректную дату возвращает как есть)"""
+    try:
+        return datetime.strptime(date, "%Y-%m-%d").strftime("%d.%m.%Y")
+    except (ValueError, TypeError):
+        return date
+
+
 class FindSlots(BaseModel):
     """
     Find available time slots for a service.
@@ -72,14 +81,15 @@ class FindSlots(BaseModel):
                 master_name_to_use = self.master_name
             
             result = asyncio.run(
-                find_slots_by_period(
+                find_slots_by_period_cached(
                     yclients_service=yclients_service,
                     service_id=self.service_id,
                     time_period=self.time_period or "",
                     master_name=master_name_to_use,
                     master_id=self.master_id,
                     date=self.date,
-                    date_range=self.date_range
+                    date_range=self.date_range,
+                    ttl=PROPOSE_TTL
                 )
             )
             
@@ -162,12 +172,7 @@ class FindSlots(BaseModel):
                                     date = day_result['date']
                                     slots = day_result['slots']
                                     
-                                    try:
-                                        date_obj = datetime.strptime(date, "%Y-%m-%d")
-                                        formatted_date = date_obj.strftime("%d.%m.%Y")
-                                    except:
-                                        formatted_date = date
-                                    
+                                    formatted_date = _format_date(date)
                                     slots_text = " | ".join(slots)
                                     result_lines.append(f"  {formatted_date}: {slots_text}")
                                 
@@ -222,12 +227,7 @@ class FindSlots(BaseModel):
                     date = day_result['date']
                     slots = day_result['slots']
                     
-                    try:
-                        date_obj = datetime.strptime(date, "%Y-%m-%d")
-                        formatted_date = date_obj.strftime("%d.%m.%Y")
-                    except:
-                        formatted_date = date
-                    
+                    formatted_date = _format_date(date)
                     slots_text = " | ".join(slots)
                     result_lines.append(f"  {formatted_date}: {slots_text}")
                 
@@ -8,6 +8,7 @@ from ....common.thread import Thread
 
 from ..common.yclients_service import YclientsService
 from .logic import reschedule_booking_logic
+from ..find_slots.cache import slots_cache
 
 try:
     from ....services.logger_service import logger
@@ -80,6 +81,8 @@ class RescheduleBooking(BaseModel):
             )
             
             if result.get('success'):
+                # Изменилась занятость - сбрасываем кэш свободных слотов
+                slots_cache.invalidate()
                 return result.get('message', 'Запись успешно перенесена')
             else:
                 error = result.get('error', 'Неизвестная ошибка')
@@ -30,6 +30,8 @@ If you are asked a question you don't know the answer to, don't make anything up
             langgraph_service=langgraph_service,
             instruction=instruction,
             tools=[GetClientRecords, CallManager],
-            agent_name="Агент просмотра записей"
+            agent_name="Агент просмотра записей",
+            # Инструменты только читают данные, поэтому их вызовы из одного ответа модели независимы
+            parallel_tools=True
         )
 
@@ -175,8 +175,7 @@ If you encounter a system error, don't know the answer to a question, or the cli
         logger.debug(f"booking_analyzer: после merge_booking_state, updated_booking_state: {updated_booking_state}")
         
         # Обновляем extracted_info
-        updated_extracted_info = extracted_info.copy()
-        updated_extracted_info["booking"] = updated_booking_state
+        updated_extracted_info = extracted_info | {"booking": updated_booking_state}
         
         logger.info(f"Извлеченные данные: {extracted_data}")
         logger.info(f"Обновленное состояние бронирования: {updated_booking_state}")
@@ -205,8 +205,7 @@ def try_update_booking_state_from_reply(
     updated_booking_state = merge_booking_state(current_booking_state, extracted_data)
     
     # Обновляем extracted_info
-    updated_extracted_info = extracted_info.copy()
-    updated_extracted_info["booking"] = updated_booking_state
+    updated_extracted_info = extracted_info | {"booking": updated_booking_state}
     
     logger.info(f"Обнаружен JSON в ответе LLM, обновлено состояние бронирования: {extracted_data}")
     logger.info(f"Обновленное состояние бронирования: {updated_booking_state}")
@@ -1,6 +1,7 @@
 """
 Граф состояний для подграфа бронирования (Booking Subgraph)
 """
+import inspect
 from typing import Dict, Any, Literal, TypedDict, Annotated
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import AnyMessage, add_messages
@@ -56,17 +57,77 @@ def _conversation_state_to_booking_substate(
     return updated_state
 
 
+def _merge_node_result(
+    booking_state: BookingSubState,
+    full_conversation_state: ConversationState,
+    result: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Объединяет результат узла с состоянием графа бронирования
+    
+    Args:
+        booking_state: BookingSubState до выполнения узла
+        full_conversation_state: ConversationState, переданное в узел
+        result: Результат узла
+        
+    Returns:
+        Обновленное состояние с ключами 'booking' и 'conversation' (с answer и другими полями)
+    """
+    # Объединяем messages: существующие + новые (add_messages reducer сделает это автоматически)
+    existing_messages = full_conversation_state.get("messages", [])
+    new_messages = result.get("messages", [])
+    combined_messages = list(existing_messages) + list(new_messages) if new_messages else existing_messages
+    
+    # Обновляем conversation_state с результатами узла
+    updated_conversation_state = {**full_conversation_state, **result, "messages": combined_messages}
+    
+    # Извлекаем обновленное BookingSubState
+    updated_booking_state = _conversation_state_to_booking_substate(
+        updated_conversation_state,
+        booking_state
+    )
+    
+    # Возвращаем обновленное состояние с booking и conversation (включая answer, manager_alert и т.д.)
+    return {
+        "booking": updated_booking_state,
+        "conversation": updated_conversation_state
+    }
+
+
 def _create_booking_state_adapter(original_node):
     """
     Создает адаптер для узла, который работает с ConversationState,
     чтобы он мог работать с BookingSubState в графе
     
+    Для асинхронных узлов (async def) создается асинхронный адаптер.
+    
     Args:
         original_node: Оригинальная функция узла (принимает ConversationState)
         
     Returns:
         Функция-адаптер (принимает BookingSubState и ConversationState, возвращает обновленное состояние)
     """
+    if inspect.iscoroutinefunction(original_node):
+        async def async_adapter(state: Dict[str, Any]) -> Dict[str, Any]:
+            """
+            Асинхронный адаптер для узла
+            
+            Args:
+                state: Словарь с ключами 'booking' (BookingSubState) и 'conversation' (ConversationState)
+                
+            Returns:
+                Обновленное состояние с ключами 'booking' и 'conversation' (с answer и другими полями)
+            """
+            booking_state = state.get("booking", {})
+            full_conversation_state = _booking_substate_to_conversation_state(
+                booking_state,
+                state.get("conversation", {})
+            )
+            result = await original_node(full_conversation_state)
+            return _merge_node_result(booking_state, full_conversation_state, result)
+        
+        return async_adapter
+    
     def adapter(state: Dict[str, Any]) -> Dict[str, Any]:
         """
         Адаптер для узла
@@ -89,25 +150,7 @@ def _create_booking_state_adapter(original_node):
         # Вызываем оригинальный узел
         result = original_node(full_conversation_state)
         
-        # Объединяем messages: существующие + новые (add_messages reducer сделает это автоматически)
-        existing_messages = full_conversation_state.get("messages", [])
-        new_messages = result.get("messages", [])
-        combined_messages = list(existing_messages) + list(new_messages) if new_messages else existing_messages
-        
-        # Обновляем conversation_state с результатами узла
-        updated_conversation_state = {**full_conversation_state, **result, "messages": combined_messages}
-        
-        # Извлекаем обновленное BookingSubState
-        updated_booking_state = _conversation_state_to_booking_substate(
-            updated_conversation_state,
-            booking_state
-        )
-        
-        # Возвращаем обновленное состояние с booking и conversation (включая answer, manager_alert и т.д.)
-        return {
-            "booking": updated_booking_state,
-            "conversation": updated_conversation_state
-        }
+        return _merge_node_result(booking_state, full_conversation_state, result)
     
     return adapter
 
@@ -66,7 +66,7 @@ def contact_collector_node(state: ConversationState) -> ConversationState:
         formatted_date = dt.strftime("%d.%m.%Y")
         formatted_time = dt.strftime("%H:%M")
         slot_time_formatted = f"{formatted_date} в {formatted_time}"
-    except:
+    except (ValueError, TypeError):
         slot_time_formatted = slot_time
     
     # Формируем системный промпт согласно ТЗ
@@ -79,7 +79,7 @@ def finalizer_node(state: ConversationState) -> ConversationState:
         formatted_date = dt.strftime("%d.%m.%Y")
         formatted_time = dt.strftime("%H:%M")
         slot_time_formatted = f"{formatted_date} в {formatted_time}"
-    except:
+    except (ValueError, TypeError):
         slot_time_formatted = slot_time
     
     # Формируем системный промпт согласно ТЗ
@@ -156,11 +156,7 @@ If you encounter a system error, don't know the answer to a question, or the cli
         
         if create_booking_called:
             # Обновляем состояние: устанавливаем флаг is_finalized
-            updated_booking_state = booking_state.copy()
-            updated_booking_state["is_finalized"] = True
-            
-            updated_extracted_info = extracted_info.copy()
-            updated_extracted_info["booking"] = updated_booking_state
+            updated_extracted_info = extracted_info | {"booking": booking_state | {"is_finalized": True}}
             
             logger.info("CreateBooking был вызван, устанавливаем is_finalized=True")
             
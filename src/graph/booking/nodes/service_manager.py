@@ -102,8 +102,10 @@ def service_manager_node(state: ConversationState) -> ConversationState:
     logger.info("Запуск узла service_manager")
     
     # Получаем текущее состояние бронирования
-    extracted_info = state.get("extracted_info") or {}
-    booking_state: Dict[str, Any] = extracted_info.get("booking", {})
+    # Адаптер графа бронирования всегда кладет booking в extracted_info
+    # (см. _booking_substate_to_conversation_state), поэтому обращаемся напрямую
+    extracted_info = state["extracted_info"]
+    booking_state: BookingSubState = extracted_info["booking"]
     
     # Получаем данные для контекста
     service_id = booking_state.get("service_id")
@@ -138,7 +140,9 @@ def service_manager_node(state: ConversationState) -> ConversationState:
         tools_registry.register_tool(CallManager)
         
         # Создаем orchestrator
+        # Инструменты выбора услуги только читают данные, поэтому их можно выполнять параллельно
         config = ResponsesAPIConfig()
+        config.parallel_tools = True
         orchestrator = ResponsesOrchestrator(
             instructions=system_prompt,
             tools_registry=tools_registry,
@@ -155,6 +159,9 @@ def service_manager_node(state: ConversationState) -> ConversationState:
         # Получаем ответ
         reply = result.get("reply", "")
         tool_calls = result.get("tool_calls", [])
+        # Формируем список использованных инструментов и результаты один раз для всех веток
+        used_tools = [tc.get("name") for tc in tool_calls] if tool_calls else []
+        tool_results = tool_calls or []
         
         # Преобразуем новые сообщения из orchestrator в BaseMessage объекты
         new_messages_dicts = result.get("new_messages", [])
@@ -167,8 +174,8 @@ def service_manager_node(state: ConversationState) -> ConversationState:
                 "messages": new_messages,  # КРИТИЧНО: Возвращаем все новые сообщения
                 "answer": result.get("reply", ""),
                 "manager_alert": result.get("manager_alert"),
-                "used_tools": [tc.get("name") for tc in tool_calls] if tool_calls else [],
-                "tool_results": tool_calls if tool_calls else []
+                "used_tools": used_tools,
+                "tool_results": tool_results
             }
         
         # Проверяем, есть ли JSON в ответе для обновления состояния
@@ -191,20 +198,16 @@ def service_manager_node(state: ConversationState) -> ConversationState:
                 "messages": new_messages,
                 "answer": "",  # Пустой answer - процесс продолжается автоматически
                 "extracted_info": updated_extracted_info,
-                "used_tools": [tc.get("name") for tc in tool_calls] if tool_calls else [],
-                "tool_results": tool_calls if tool_calls else []
+                "used_tools": used_tools,
+                "tool_results": tool_results
             }
         else:
             # Если JSON не найден, все равно сбрасываем флаг service_details_needed
             updated_booking_state = merge_booking_state(booking_state, {"service_details_needed": False})
-            updated_extracted_info = extracted_info.copy()
-            updated_extracted_info["booking"] = updated_booking_state
-        
-        # Формируем список использованных инструментов
-        used_tools = [tc.get("name") for tc in tool_calls] if tool_calls else []
+            updated_extracted_info = extracted_info | {"booking": updated_booking_state}
         
-        logger.info(f"Service manager ответил: {reply[:100]}...")
-        logger.info(f"Использованные инструменты: {used_tools}")
+        logger.info("Service manager ответил: %.100s...", reply)
+        logger.info("Использованные инструменты: %s", used_tools)
         logger.info("Флаг service_details_needed сброшен в False")
         
         return {
@@ -212,15 +215,14 @@ def service_manager_node(state: ConversationState) -> ConversationState:
             "answer": reply,
             "extracted_info": updated_extracted_info,
             "used_tools": used_tools,
-            "tool_results": tool_calls if tool_calls else []
+            "tool_results": tool_results
         }
         
     except Exception as e:
-        logger.error(f"Ошибка в service_manager_node: {e}", exc_info=True)
+        logger.error("Ошибка в service_manager_node: %s", e, exc_info=True)
         # Даже при ошибке сбрасываем флаг service_details_needed
         updated_booking_state = merge_booking_state(booking_state, {"service_details_needed": False})
-        updated_extracted_info = extracted_info.copy()
-        updated_extracted_info["booking"] = updated_booking_state
+        updated_extracted_info = extracted_info | {"booking": updated_booking_state}
         return {
             "answer": "Извините, произошла ошибка при выборе услуги. Попробуйте еще раз.",
             "extracted_info": updated_extracted_info
@@ -2,9 +2,16 @@
 Узел менеджера слотов для предложения доступных временных слотов в процессе бронирования
 """
 import asyncio
-from datetime import datetime
-from typing import Dict, Any, Optional
+import bisect
+import calendar
+import functools
+import re
+import time
+from datetime import datetime, timedelta
+from enum import IntEnum
+from typing import Dict, Any, Optional, Tuple
 from difflib import SequenceMatcher
+import aiohttp
 from ...conversation_state import ConversationState
 from ...utils import messages_to_history, dicts_to_messages, filter_history_conversation_only
 from ..state import BookingSubState
@@ -12,18 +19,112 @@ from ..booking_state_updater import try_update_booking_state_from_reply
 from ....services.responses_api.orchestrator import ResponsesOrchestrator
 from ....services.responses_api.tools_registry import ResponsesToolsRegistry
 from ....services.responses_api.config import ResponsesAPIConfig
+from ....services.responses_api.client import ResponsesAPIClient
 from ....services.logger_service import logger
+from ....services.escalation_service import EscalationService
 
 # Импортируем инструмент и логику
 from ....agents.tools.find_slots.tool import FindSlots
-from ....agents.tools.find_slots.logic import find_slots_by_period
+from ....agents.tools.find_slots.cache import find_slots_by_period_cached, get_master_day_times, is_waitlist_service, VERIFY_TTL
 from ....agents.tools.common.yclients_service import YclientsService
 from ....agents.tools.call_manager import CallManager
-from ....agents.tools.common.book_times_logic import _get_name_variants, _normalize_name
+from ....agents.tools.common.book_times_logic import _get_name_variants, _normalize_name, _merge_consecutive_slots
 from langchain_core.messages import AIMessage
 
 
-def slot_manager_node(state: ConversationState) -> ConversationState:
+# Набор инструментов и конфигурация не зависят от хода диалога - создаем их один раз.
+# Переменные окружения к моменту импорта уже загружены (load_dotenv в main.py)
+_TOOLS_REGISTRY = ResponsesToolsRegistry()
+_TOOLS_REGISTRY.register_tool(FindSlots)
+_TOOLS_REGISTRY.register_tool(CallManager)
+_CONFIG = ResponsesAPIConfig()
+# Клиент API создается при первом вызове и переиспользуется между ходами
+_client: Optional[ResponsesAPIClient] = None
+
+
+def _get_client() -> ResponsesAPIClient:
+    """Возвращает общий клиент API для slot_manager"""
+    global _client
+    if _client is None:
+        _client = ResponsesAPIClient(_CONFIG)
+    return _client
+
+
+# Сервис YClients переиспользуется между вызовами вместе с HTTP-сессией (keep-alive),
+# чтобы не устанавливать TCP/TLS соединение с API на каждую проверку времени.
+# Сессия привязана к event loop, в котором создана, поэтому запоминаем и loop
+_yclients_service: Optional[YclientsService] = None
+_yclients_session: Optional[aiohttp.ClientSession] = None
+_yclients_service_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def _close_session(session: aiohttp.ClientSession, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """
+    Закрывает HTTP-сессию в том event loop, в котором она создана
+    
+    Если тот loop еще работает (в другом потоке), закрытие планируется в нем.
+    Если он уже закрыт, сессия закрывается в текущем loop - ошибки закрытия
+    транспортов мертвого loop только логируются.
+    """
+    if session.closed:
+        return
+    current_loop = asyncio.get_running_loop()
+    try:
+        if loop is not None and loop is not current_loop and loop.is_running() and not loop.is_closed():
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), loop))
+        else:
+            await session.close()
+    except Exception as e:
+        logger.warning("Не удалось закрыть HTTP-сессию YClients: %s", e)
+
+
+async def _get_yclients_service() -> YclientsService:
+    """
+    Возвращает общий экземпляр YclientsService для текущего event loop
+    
+    При смене loop сессия предыдущего loop закрывается. Успешное создание после
+    этого не содержит await, поэтому внутри одного loop выполняется атомарно
+    и дополнительная блокировка не нужна.
+    
+    Raises:
+        ValueError: Если не заданы переменные окружения (экземпляр не кэшируется)
+    """
+    global _yclients_service, _yclients_session, _yclients_service_loop
+    loop = asyncio.get_running_loop()
+    if _yclients_service is None or _yclients_service_loop is not loop:
+        old_session, old_loop = _yclients_session, _yclients_service_loop
+        _yclients_service = None
+        _yclients_session = None
+        _yclients_service_loop = None
+        if old_session is not None:
+            await _close_session(old_session, old_loop)
+        if _yclients_service is not None and _yclients_service_loop is loop:
+            # Пока закрывали старую сессию, сервис для этого loop уже создала другая корутина
+            return _yclients_service
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=20))
+        try:
+            service = YclientsService(session=session)
+        except ValueError:
+            await session.close()
+            raise
+        _yclients_service = service
+        _yclients_session = session
+        _yclients_service_loop = loop
+    return _yclients_service
+
+
+async def close_yclients_service() -> None:
+    """Закрывает общую HTTP-сессию YClients (вызывается при остановке приложения)"""
+    global _yclients_service, _yclients_session, _yclients_service_loop
+    session, loop = _yclients_session, _yclients_service_loop
+    _yclients_service = None
+    _yclients_session = None
+    _yclients_service_loop = None
+    if session is not None:
+        await _close_session(session, loop)
+
+
+async def slot_manager_node(state: ConversationState) -> ConversationState:
     """
     Узел менеджера слотов для предложения доступных временных слотов
     
@@ -40,8 +141,10 @@ def slot_manager_node(state: ConversationState) -> ConversationState:
     logger.info("Запуск узла slot_manager")
     
     # Получаем текущее состояние бронирования
-    extracted_info = state.get("extracted_info") or {}
-    booking_state: Dict[str, Any] = extracted_info.get("booking", {})
+    # Адаптер графа бронирования всегда кладет booking в extracted_info
+    # (см. _booking_substate_to_conversation_state), поэтому обращаемся напрямую
+    extracted_info = state["extracted_info"]
+    booking_state: BookingSubState = extracted_info["booking"]
     
     # Получаем service_id из состояния
     service_id = booking_state.get("service_id")
@@ -58,115 +161,263 @@ def slot_manager_node(state: ConversationState) -> ConversationState:
     # Если slot_time указан, но не проверен - проверяем его доступность
     # ВАЖНО: Если время 00:00, это не считается выбранным временем, обрабатываем как дату без времени
     if slot_time and not slot_time_verified:
-        if _is_midnight_time(slot_time):
-            logger.info(f"Обнаружено время 00:00 в slot_time={slot_time}, обрабатываем как дату без времени")
+        # Разбираем slot_time один раз и передаем результат дальше
+        parsed_slot_time = _parse_slot_time(slot_time)
+        if parsed_slot_time and parsed_slot_time[2] == 0 and parsed_slot_time[3] == 0:
+            logger.info("Обнаружено время 00:00 в slot_time=%s, обрабатываем как дату без времени", slot_time)
             # Сбрасываем slot_time, чтобы slot_manager искал слоты на эту дату
-            updated_booking_state = booking_state.copy()
-            updated_booking_state["slot_time"] = None
-            updated_booking_state["slot_time_verified"] = None
+            updated_extracted_info = _with_booking(extracted_info, booking_state, slot_time=None, slot_time_verified=None)
             # Продолжаем с поиском слотов на эту дату
-            return _find_and_offer_slots(
-                {
-                    **state,
-                    "extracted_info": {
-                        **state.get("extracted_info", {}),
-                        "booking": updated_booking_state
-                    }
-                },
-                updated_booking_state,
+            return await _find_and_offer_slots(
+                {**state, "extracted_info": updated_extracted_info},
+                updated_extracted_info["booking"],
                 service_id
             )
-        logger.info(f"Проверка доступности указанного времени: {slot_time}")
-        return _verify_slot_time_availability(state, booking_state, service_id, slot_time)
+        logger.info("Проверка доступности указанного времени: %s", slot_time)
+        return await _verify_slot_time_availability(state, booking_state, service_id, slot_time, parsed_slot_time)
     
     # Иначе - обычная логика: ищем и предлагаем слоты
-    return _find_and_offer_slots(state, booking_state, service_id)
+    return await _find_and_offer_slots(state, booking_state, service_id)
 
 
-def _is_midnight_time(slot_time: str) -> bool:
+def _with_booking(extracted_info: Dict[str, Any], booking_state: Dict[str, Any], **fields: Any) -> Dict[str, Any]:
     """
-    Проверяет, является ли время в slot_time полночью (00:00)
+    Возвращает extracted_info с обновленными полями booking
+    
+    Состояние бронирования собирается одним словарем (booking_state | fields) вместо
+    copy() с последующими присваиваниями. Остальные ключи extracted_info сохраняются,
+    так как адаптер графа бронирования заменяет extracted_info целиком.
+    """
+    return {**extracted_info, "booking": booking_state | fields}
+
+
+# Строгий формат slot_time "YYYY-MM-DD HH:MM" (только ASCII-цифры)
+_SLOT_TIME_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2})', re.ASCII)
+
+
+def _parse_slot_time(slot_time: Optional[str]) -> Optional[Tuple[str, str, int, int]]:
+    """
+    Разбирает slot_time формата "YYYY-MM-DD HH:MM"
+    
+    Строки строго в этом формате проверяются регуляркой и арифметикой, без
+    datetime.strptime и исключений; strptime остается запасным вариантом для
+    остальных записей (например, час без ведущего нуля).
     
     Args:
         slot_time: Время в формате "YYYY-MM-DD HH:MM"
         
     Returns:
-        True, если время равно 00:00, иначе False
+        Кортеж (дата "YYYY-MM-DD", время "HH:MM", часы, минуты) или None, если формат неверный
     """
+    if not isinstance(slot_time, str):
+        return None
+    
+    match = _SLOT_TIME_RE.fullmatch(slot_time)
+    if match:
+        year, month, day, hour, minute = map(int, match.groups())
+        # Проверяем диапазоны (месяц, день, часы, минуты) так же, как strptime
+        if (
+            year >= 1
+            and 1 <= month <= 12
+            and 1 <= day <= calendar.monthrange(year, month)[1]
+            and hour < 24
+            and minute < 60
+        ):
+            return slot_time[:10], slot_time[11:16], hour, minute
+        return None
+    
     try:
         dt = datetime.strptime(slot_time, "%Y-%m-%d %H:%M")
-        return dt.hour == 0 and dt.minute == 0
-    except (ValueError, AttributeError):
-        return False
+    except ValueError:
+        return None
+    return dt.strftime("%Y-%m-%d"), dt.strftime("%H:%M"), dt.hour, dt.minute
+
+
+class TimePref(IntEnum):
+    """Тип пожелания клиента по времени"""
+    NONE = 0
+    MORNING = 1
+    DAY = 2
+    EVENING = 3
+    AFTER = 4
+    BEFORE = 5
+    TOMORROW = 6
+    DAY_AFTER = 7
+    TODAY = 8
+    EXACT = 9
+
+
+# Описание пожеланий для промпта (для AFTER/BEFORE/EXACT описание строится из detail)
+_PREF_DESCRIPTIONS = {
+    TimePref.MORNING: "Утром",
+    TimePref.DAY: "Днем",
+    TimePref.EVENING: "Вечером",
+    TimePref.TOMORROW: "Завтра",
+    TimePref.DAY_AFTER: "Послезавтра",
+    TimePref.TODAY: "Сегодня",
+}
+
+# Смещение в днях от сегодняшней даты для параметра date
+_PREF_TO_DAY_OFFSET = {
+    TimePref.TODAY: 0,
+    TimePref.TOMORROW: 1,
+    TimePref.DAY_AFTER: 2,
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _relative_dates(minute_bucket: int) -> Tuple[str, str, str]:
+    """
+    Даты "сегодня", "завтра", "послезавтра" в формате "YYYY-MM-DD"
+    
+    Кэшируется по номеру текущей минуты: datetime.now() и форматирование
+    выполняются не чаще раза в минуту.
+    """
+    today = datetime.now().date()
+    return tuple((today + timedelta(days=offset)).isoformat() for offset in range(3))
+
 
+# Основы слов пожеланий по времени: слово сообщения подходит, если начинается с одной из них
+# ("в 7 вечера", "вечерком", "утречком", "завтрашний", "послезавтрашний")
+_MORNING_STEMS = ("утро", "утра", "утре")
+_DAY_STEMS = ("днем", "днём", "дневн")
+_EVENING_STEMS = ("вечер",)
+_DAY_AFTER_STEMS = ("послезавтра",)
+_TOMORROW_STEMS = ("завтра", "tomorrow")
+_TODAY_STEMS = ("сегодня", "today")
 
-def _extract_time_preference(slot_time: Optional[str], user_message: str) -> str:
+_WORD_RE = re.compile(r'\w+')
+# Граница времени: "после 18", "до 12:30", "позже 17", "раньше 11" - один проход по сообщению
+_TIME_BOUND_RE = re.compile(r'\b(?P<dir>до|после|раньше|позже)\s+(?P<hour>\d{1,2})(?::?(?P<minute>\d{2}))?')
+# Дата "YYYY-MM-DD" внутри slot_time, который не удалось разобрать целиком
+_ISO_DATE_RE = re.compile(r'(\d{4}-\d{2}-\d{2})')
+_TIME_BOUND_PREFS = {
+    "после": TimePref.AFTER,
+    "позже": TimePref.AFTER,
+    "до": TimePref.BEFORE,
+    "раньше": TimePref.BEFORE,
+}
+_TIME_BOUND_WORDS = frozenset(_TIME_BOUND_PREFS)
+
+
+def _has_stem(words: list, stems: Tuple[str, ...]) -> bool:
+    """Проверяет, начинается ли хотя бы одно слово сообщения с одной из основ"""
+    return any(word.startswith(stems) for word in words)
+
+
+@functools.lru_cache(maxsize=256)
+def _extract_time_preference(slot_time: Optional[str], user_message: str) -> Tuple[TimePref, Tuple[str, ...]]:
     """
     Извлекает пожелания по времени из slot_time или сообщения пользователя
     
+    Функция чистая и не зависит от текущей даты (относительные даты вычисляет
+    вызывающий), поэтому результат кэшируется по аргументам.
+    
     Args:
         slot_time: Конкретное время слота (если есть)
         user_message: Сообщение пользователя
         
     Returns:
-        Строка с описанием пожеланий по времени для промпта
+        Кортеж (тип пожелания, детали):
+        - AFTER/BEFORE: ("HH:MM",)
+        - EXACT: (дата "YYYY-MM-DD", время "HH:MM" или ""), либо ("", исходный slot_time), если его не удалось разобрать
+        - остальные: ()
     """
     if slot_time:
         # Если есть конкретное время, преобразуем его в пожелание
         # Формат slot_time: "YYYY-MM-DD HH:MM"
         # ВАЖНО: Если время 00:00, это не считается выбранным временем
-        if _is_midnight_time(slot_time):
+        parsed_slot_time = _parse_slot_time(slot_time)
+        if parsed_slot_time is None:
+            return TimePref.EXACT, ("", slot_time)
+        date_str, time_str, hour, minute = parsed_slot_time
+        if hour == 0 and minute == 0:
             # Обрабатываем как дату без времени
-            try:
-                dt = datetime.strptime(slot_time, "%Y-%m-%d %H:%M")
-                date_str = dt.strftime("%Y-%m-%d")
-                return f"Конкретная дата: {date_str}"
-            except:
-                return ""
-        try:
-            dt = datetime.strptime(slot_time, "%Y-%m-%d %H:%M")
-            date_str = dt.strftime("%Y-%m-%d")
-            time_str = dt.strftime("%H:%M")
-            return f"Конкретная дата и время: {date_str} в {time_str}"
-        except:
-            return f"Конкретное время: {slot_time}"
+            return TimePref.EXACT, (date_str, "")
+        return TimePref.EXACT, (date_str, time_str)
     
     # Ищем пожелания в сообщении пользователя
     message_lower = user_message.lower()
+    words = _WORD_RE.findall(message_lower)
     
     # Проверяем на упоминания времени суток
-    if any(word in message_lower for word in ["утром", "утра", "утреннее"]):
-        return "Утром"
-    elif any(word in message_lower for word in ["днем", "днём", "дневное"]):
-        return "Днем"
-    elif any(word in message_lower for word in ["вечером", "вечер", "вечернее"]):
-        return "Вечером"
-    elif any(word in message_lower for word in ["после", "позже"]):
-        # Пытаемся извлечь время после слова "после"
-        import re
-        after_match = re.search(r'после\s+(\d{1,2}):?(\d{2})?', message_lower)
-        if after_match:
-            hour = after_match.group(1)
-            minute = after_match.group(2) or "00"
-            return f"После {hour}:{minute}"
-    elif any(word in message_lower for word in ["до", "раньше"]):
-        # Пытаемся извлечь время после слова "до"
-        import re
-        before_match = re.search(r'до\s+(\d{1,2}):?(\d{2})?', message_lower)
-        if before_match:
-            hour = before_match.group(1)
-            minute = before_match.group(2) or "00"
-            return f"До {hour}:{minute}"
-    
-    # Проверяем на упоминания дат
-    if any(word in message_lower for word in ["завтра", "tomorrow"]):
-        return "Завтра"
-    elif any(word in message_lower for word in ["послезавтра"]):
-        return "Послезавтра"
-    elif any(word in message_lower for word in ["сегодня", "today"]):
-        return "Сегодня"
-    
-    return ""
+    if _has_stem(words, _MORNING_STEMS):
+        return TimePref.MORNING, ()
+    elif _has_stem(words, _DAY_STEMS):
+        return TimePref.DAY, ()
+    elif _has_stem(words, _EVENING_STEMS):
+        return TimePref.EVENING, ()
+    
+    # Ищем границу по времени ("после 18:00", "до 12"); регулярку запускаем,
+    # только если в сообщении есть одно из слов-границ
+    if not _TIME_BOUND_WORDS.isdisjoint(words):
+        bound_match = _TIME_BOUND_RE.search(message_lower)
+        if bound_match:
+            minute = bound_match.group("minute") or "00"
+            return _TIME_BOUND_PREFS[bound_match.group("dir")], (f"{bound_match.group('hour')}:{minute}",)
+    
+    # Проверяем на упоминания дат ("послезавтра" проверяем раньше "завтра")
+    if _has_stem(words, _DAY_AFTER_STEMS):
+        return TimePref.DAY_AFTER, ()
+    elif _has_stem(words, _TOMORROW_STEMS):
+        return TimePref.TOMORROW, ()
+    elif _has_stem(words, _TODAY_STEMS):
+        return TimePref.TODAY, ()
+    
+    return TimePref.NONE, ()
+
+
+def _describe_time_preference(time_pref: TimePref, detail: Tuple[str, ...]) -> str:
+    """
+    Формирует описание пожеланий по времени для промпта
+    
+    Args:
+        time_pref: Тип пожелания
+        detail: Детали пожелания (см. _extract_time_preference)
+        
+    Returns:
+        Строка с описанием пожеланий (пустая, если пожеланий нет)
+    """
+    if time_pref == TimePref.AFTER:
+        return f"После {detail[0]}"
+    if time_pref == TimePref.BEFORE:
+        return f"До {detail[0]}"
+    if time_pref == TimePref.EXACT:
+        date_str, time_str = detail
+        if not date_str:
+            return f"Конкретное время: {time_str}"
+        if not time_str:
+            return f"Конкретная дата: {date_str}"
+        return f"Конкретная дата и время: {date_str} в {time_str}"
+    return _PREF_DESCRIPTIONS.get(time_pref, "")
+
+
+def _exact_date_param(detail: Tuple[str, ...], date_override: Optional[str]) -> str:
+    """Инструкция date для конкретного slot_time (дата берется из разобранного slot_time или ищется в исходной строке)"""
+    date_str, raw_time = detail
+    if not date_str:
+        date_match = _ISO_DATE_RE.search(raw_time)
+        date_str = date_match.group(1) if date_match else ""
+    return f"- date: pass '{date_str}'\n" if date_str else ""
+
+
+def _relative_date_param(detail: Tuple[str, ...], date_override: Optional[str]) -> str:
+    """Инструкция date для "сегодня/завтра/послезавтра" (дату вычисляет вызывающий)"""
+    return f"- date: pass '{date_override}'\n" if date_override else ""
+
+
+# Построители инструкций FindSlots по типу пожелания: (detail, date_override) -> строка
+_PARAM_BUILDERS = {
+    TimePref.MORNING: lambda detail, date_override: "- time_period: pass 'morning'\n",
+    TimePref.DAY: lambda detail, date_override: "- time_period: pass 'day'\n",
+    TimePref.EVENING: lambda detail, date_override: "- time_period: pass 'evening'\n",
+    TimePref.AFTER: lambda detail, date_override: f"- time_period: pass 'after {detail[0]}'\n",
+    TimePref.BEFORE: lambda detail, date_override: f"- time_period: pass 'before {detail[0]}'\n",
+    TimePref.TODAY: _relative_date_param,
+    TimePref.TOMORROW: _relative_date_param,
+    TimePref.DAY_AFTER: _relative_date_param,
+    TimePref.EXACT: _exact_date_param,
+}
 
 
 def _is_master_name_match(search_name: str, master_name: str, similarity_threshold: float = 0.85) -> bool:
@@ -222,11 +473,188 @@ def _is_master_name_match(search_name: str, master_name: str, similarity_thresho
     return similarity >= effective_threshold
 
 
-def _verify_slot_time_availability(
+# Верхняя граница минут для поиска интервала бинарным поиском
+_MINUTES_IN_DAY = 24 * 60
+# Шаг начал записи внутри интервала слотов (см. _merge_consecutive_slots)
+_SLOT_STEP_MINUTES = 30
+
+
+def _hhmm(time_str: str) -> int:
+    """Переводит "HH:MM" в минуты от начала дня арифметикой по кодам цифр (без split/int)"""
+    if len(time_str) == 5:
+        return (ord(time_str[0]) - 48) * 600 + (ord(time_str[1]) - 48) * 60 + (ord(time_str[3]) - 48) * 10 + (ord(time_str[4]) - 48)
+    hours, _, minutes = time_str.partition(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def _slot_interval(slot: str) -> Tuple[int, int]:
+    """
+    Переводит слот из результата find_slots_by_period в интервал минут (начало, конец)
+    
+    Слот - это отдельное время "HH:MM" или интервал "HH:MM-HH:MM" из последовательных
+    начал записи с шагом 30 минут (см. _merge_consecutive_slots), конец интервала включительно.
+    Для отдельного времени начало и конец совпадают.
+    """
+    if len(slot) == 5:
+        start_minutes = _hhmm(slot)
+        return start_minutes, start_minutes
+    if len(slot) == 11 and slot[5] == '-':
+        return _hhmm(slot[:5]), _hhmm(slot[6:])
+    # Нестандартная запись (пробелы вокруг "-", час без ведущего нуля)
+    start, _, end = slot.partition('-')
+    start_minutes = _hhmm(start.strip())
+    return start_minutes, (_hhmm(end.strip()) if end else start_minutes)
+
+
+def _is_time_in_slots(slots: list, target_minutes: int) -> bool:
+    """
+    Проверяет, можно ли записаться на время по слотам одного мастера
+    
+    Интервал - это последовательные начала записи с шагом 30 минут, и его конец -
+    последнее из них. Поэтому подходят только начала на этой сетке, включая конец
+    ("10:00-12:00" принимает 10:00, 10:30, ..., 12:00, но не 10:15). Так же проверяет
+    быстрый путь по book_times. Слоты одного мастера не пересекаются, поэтому после
+    сортировки интервалов кандидат находится бинарным поиском по началам.
+    
+    Args:
+        slots: Слоты мастера в формате "HH:MM" или "HH:MM-HH:MM"
+        target_minutes: Проверяемое время в минутах от начала дня
+        
+    Returns:
+        True, если на это время можно записаться
+    """
+    intervals = sorted(map(_slot_interval, slots))
+    index = bisect.bisect_right(intervals, (target_minutes, _MINUTES_IN_DAY)) - 1
+    if index < 0:
+        return False
+    start_minutes, end_minutes = intervals[index]
+    return target_minutes <= end_minutes and (target_minutes - start_minutes) % _SLOT_STEP_MINUTES == 0
+
+
+def _collect_day_slots(
+    masters: list,
+    master_id: Optional[int],
+    master_name: Optional[str],
+    date_str: str
+) -> list:
+    """
+    Собирает слоты на дату для подходящих мастеров из результата find_slots_by_period
+    
+    Args:
+        masters: Поле masters результата find_slots_by_period
+        master_id: ID выбранного мастера (если есть)
+        master_name: Имя выбранного мастера (если есть)
+        date_str: Дата в формате "YYYY-MM-DD"
+        
+    Returns:
+        Список пар (имя мастера, слоты) только для мастеров со слотами на эту дату
+    """
+    # Индекс (master_id, дата) -> слоты строится за один проход по ответу
+    slots_index = {
+        (master_data.get('master_id'), day_result.get('date')): day_result.get('slots') or []
+        for master_data in masters
+        for day_result in master_data.get('results', [])
+    }
+    names = {master_data.get('master_id'): master_data.get('master_name') or '' for master_data in masters}
+    
+    # Определяем подходящих мастеров
+    if master_id:
+        candidates = [master_id]
+    elif master_name:
+        # Используем нечеткое сравнение имен
+        candidates = [
+            mid for mid, name in names.items()
+            if name and _is_master_name_match(master_name, name)
+        ]
+    else:
+        candidates = list(names)
+    
+    day_slots = []
+    for mid in candidates:
+        slots = slots_index.get((mid, date_str))
+        if slots:
+            day_slots.append((names.get(mid, ''), slots))
+    return day_slots
+
+
+def _reset_slot_time_reply(
+    extracted_info: Dict[str, Any],
+    booking_state: Dict[str, Any],
+    answer_text: str
+) -> ConversationState:
+    """
+    Сбрасывает slot_time и возвращает ответ клиенту
+    
+    AIMessage с ответом возвращается в messages, чтобы сохраниться в истории LangGraph.
+    """
+    return {
+        "extracted_info": _with_booking(extracted_info, booking_state, slot_time=None, slot_time_verified=None),
+        "messages": [AIMessage(content=answer_text)],
+        "answer": answer_text
+    }
+
+
+def _escalate_verification_error(
+    state: ConversationState,
+    booking_state: Dict[str, Any],
+    service_id: int,
+    slot_time: str,
+    error: Any
+) -> ConversationState:
+    """
+    Вызывает менеджера при технической ошибке API (429) во время проверки времени
+    
+    Args:
+        state: Текущее состояние диалога
+        booking_state: Состояние бронирования
+        service_id: ID услуги
+        slot_time: Проверяемое время
+        error: Текст ошибки или исключение
+        
+    Returns:
+        Состояние с ответом клиенту и алертом для менеджера
+    """
+    extracted_info = state["extracted_info"]
+    try:
+        chat_id = state.get("chat_id") or "unknown"
+        
+        # Формируем отчет для менеджера
+        manager_report = (
+            "Отчет для менеджера:\n"
+            "Причина: Техническая ошибка API при проверке доступности времени\n"
+            f"Ошибка: {error}\n"
+            f"Попытка проверки времени: {slot_time}\n"
+            f"Service ID: {service_id}\n"
+        )
+        master_name = booking_state.get("master_name")
+        if master_name:
+            manager_report += f"Мастер: {master_name}\n"
+        
+        # Обрабатываем через EscalationService
+        escalation_result = EscalationService().handle(f"[CALL_MANAGER]\n{manager_report}", str(chat_id))
+        
+        # Возвращаем результат с вызовом менеджера
+        return {
+            "extracted_info": extracted_info,
+            "answer": escalation_result.get("user_message", ""),
+            "manager_alert": escalation_result.get("manager_alert")
+        }
+    except Exception as escalation_error:
+        logger.error("Ошибка при вызове менеджера: %s", escalation_error, exc_info=True)
+        # Если не удалось вызвать менеджера, возвращаем общее сообщение об ошибке
+        return _reset_slot_time_reply(
+            extracted_info,
+            booking_state,
+            "Извините, произошла техническая ошибка. Наш менеджер свяжется с вами в ближайшее время."
+        )
+
+
+async def _verify_slot_time_availability(
     state: ConversationState,
     booking_state: Dict[str, Any],
     service_id: int,
-    slot_time: str
+    slot_time: str,
+    parsed_slot_time: Optional[Tuple[str, str, int, int]]
 ) -> ConversationState:
     """
     Проверяет доступность указанного времени слота
@@ -236,31 +664,24 @@ def _verify_slot_time_availability(
         booking_state: Состояние бронирования
         service_id: ID услуги
         slot_time: Время слота в формате "YYYY-MM-DD HH:MM"
+        parsed_slot_time: Результат _parse_slot_time(slot_time) (None, если формат неверный)
         
     Returns:
         Обновленное состояние с результатом проверки
     """
+    extracted_info = state["extracted_info"]
     try:
-        # Парсим время
-        try:
-            dt = datetime.strptime(slot_time, "%Y-%m-%d %H:%M")
-            date_str = dt.strftime("%Y-%m-%d")
-            time_str = dt.strftime("%H:%M")
-        except ValueError as parse_error:
-            logger.error(f"Неверный формат slot_time: {slot_time}, ошибка: {parse_error}")
+        if not parsed_slot_time:
+            logger.error("Неверный формат slot_time: %s", slot_time)
             # Сбрасываем некорректное время
-            updated_booking_state = booking_state.copy()
-            updated_booking_state["slot_time"] = None
-            updated_booking_state["slot_time_verified"] = None
-            answer_text = "Извините, произошла ошибка с указанным временем. Давайте выберем другое время."
-            return {
-                "extracted_info": {
-                    **state.get("extracted_info", {}),
-                    "booking": updated_booking_state
-                },
-                "messages": [AIMessage(content=answer_text)],
-                "answer": answer_text
-            }
+            return _reset_slot_time_reply(
+                extracted_info,
+                booking_state,
+                "Извините, произошла ошибка с указанным временем. Давайте выберем другое время."
+            )
+        date_str, time_str = parsed_slot_time[0], parsed_slot_time[1]
+        # Дата для сообщений клиенту (date_str уже нормализован в "YYYY-MM-DD")
+        formatted_date = f"{date_str[8:10]}.{date_str[5:7]}.{date_str[:4]}"
         
         # Получаем параметры мастера
         master_id = booking_state.get("master_id")
@@ -268,273 +689,119 @@ def _verify_slot_time_availability(
         
         # Проверяем доступность через FindSlots
         try:
-            yclients_service = YclientsService()
+            yclients_service = await _get_yclients_service()
         except ValueError as e:
-            logger.error(f"Ошибка конфигурации YclientsService: {e}")
+            logger.error("Ошибка конфигурации YclientsService: %s", e)
             # Сбрасываем время при ошибке конфигурации
-            updated_booking_state = booking_state.copy()
-            updated_booking_state["slot_time"] = None
-            updated_booking_state["slot_time_verified"] = None
-            answer_text = "Извините, произошла ошибка при проверке доступности времени. Попробуйте еще раз."
-            return {
-                "extracted_info": {
-                    **state.get("extracted_info", {}),
-                    "booking": updated_booking_state
-                },
-                "messages": [AIMessage(content=answer_text)],
-                "answer": answer_text
-            }
+            return _reset_slot_time_reply(
+                extracted_info,
+                booking_state,
+                "Извините, произошла ошибка при проверке доступности времени. Попробуйте еще раз."
+            )
         
-        # Вызываем find_slots_by_period для проверки конкретного времени
-        result = asyncio.run(
-            find_slots_by_period(
+        target_minutes = parsed_slot_time[2] * 60 + parsed_slot_time[3]
+        day_slots = None
+        
+        # Быстрый путь: мастер известен - достаточно одного запроса book_times на эту дату
+        # и проверки по множеству свободных начал записи, без объединения в интервалы.
+        # "Лист ожидания" свободного времени не имеет - как и в find_slots_by_period
+        if master_id:
+            try:
+                if await is_waitlist_service(yclients_service, service_id):
+                    day_times = {}
+                else:
+                    day_times = await get_master_day_times(yclients_service, service_id, master_id, date_str)
+            except Exception as e:
+                # Любая ошибка (в том числе 429) - проверяем общим путем через find_slots_by_period,
+                # который сам решает, что считать технической ошибкой
+                logger.warning("Не удалось получить расписание мастера %s на %s: %s", master_id, date_str, e)
+            else:
+                time_found = target_minutes in day_times
+                day_slots = [(master_name or "", _merge_consecutive_slots(list(day_times.values())))] if day_times else []
+        
+        if day_slots is None:
+            # Запрашиваем все слоты на дату одним вызовом: проверка времени делается локально,
+            # а при промахе из этого же ответа предлагаем клиенту другое время на эту дату
+            # Для проверки конкретного времени допускаем только очень свежий кэш
+            result = await find_slots_by_period_cached(
                 yclients_service=yclients_service,
                 service_id=service_id,
-                time_period=time_str,  # Конкретное время для проверки
+                time_period="",  # Без фильтра по времени - весь день
                 master_name=master_name,
                 master_id=master_id,
-                date=date_str
+                date=date_str,
+                ttl=VERIFY_TTL
             )
-        )
-        
-        if result.get('error'):
-            error_message = result['error']
-            is_technical_error = result.get('is_technical_error', False)
-            
-            logger.warning(f"Ошибка при проверке доступности времени: {error_message}")
-            
-            # Если это техническая ошибка (429 после всех retry) - вызываем менеджера
-            if is_technical_error:
-                logger.error(f"Техническая ошибка API (429) при проверке доступности времени. Вызываем менеджера.")
-                try:
-                    from ....services.escalation_service import EscalationService
-                    
-                    chat_id = state.get("chat_id")
-                    if not chat_id:
-                        chat_id = "unknown"
-                    
-                    # Формируем отчет для менеджера
-                    manager_report = f"Отчет для менеджера:\n"
-                    manager_report += f"Причина: Техническая ошибка API при проверке доступности времени\n"
-                    manager_report += f"Ошибка: {error_message}\n"
-                    manager_report += f"Попытка проверки времени: {slot_time}\n"
-                    manager_report += f"Service ID: {service_id}\n"
-                    if master_name:
-                        manager_report += f"Мастер: {master_name}\n"
-                    
-                    # Используем EscalationService для формирования ответа
-                    escalation_service = EscalationService()
-                    call_manager_text = f"[CALL_MANAGER]\n{manager_report}"
-                    
-                    # Обрабатываем через EscalationService
-                    escalation_result = escalation_service.handle(call_manager_text, str(chat_id))
-                    
-                    # Возвращаем результат с вызовом менеджера
-                    return {
-                        "extracted_info": state.get("extracted_info", {}),
-                        "answer": escalation_result.get("user_message", ""),
-                        "manager_alert": escalation_result.get("manager_alert")
-                    }
-                except Exception as escalation_error:
-                    logger.error(f"Ошибка при вызове менеджера: {escalation_error}", exc_info=True)
-                    # Если не удалось вызвать менеджера, возвращаем общее сообщение об ошибке
-                    updated_booking_state = booking_state.copy()
-                    updated_booking_state["slot_time"] = None
-                    updated_booking_state["slot_time_verified"] = None
-                    answer_text = "Извините, произошла техническая ошибка. Наш менеджер свяжется с вами в ближайшее время."
-                    return {
-                        "extracted_info": {
-                            **state.get("extracted_info", {}),
-                            "booking": updated_booking_state
-                        },
-                        "messages": [AIMessage(content=answer_text)],
-                        "answer": answer_text
-                    }
             
-            # Если это не техническая ошибка - обычная обработка (время недоступно)
-            updated_booking_state = booking_state.copy()
-            updated_booking_state["slot_time"] = None
-            updated_booking_state["slot_time_verified"] = None
-            answer_text = f"К сожалению, время {time_str} на {date_str} недоступно. Давайте выберем другое время?"
-            return {
-                "extracted_info": {
-                    **state.get("extracted_info", {}),
-                    "booking": updated_booking_state
-                },
-                "messages": [AIMessage(content=answer_text)],
-                "answer": answer_text
-            }
-        
-        # Проверяем, есть ли это время в результатах
-        # Структура результата: {"masters": [{"results": [{"date": ..., "slots": [...]}]}]}
-        masters = result.get('masters', [])
-        time_found = False
-        
-        # Преобразуем время в минуты для проверки
-        def time_to_minutes(time_str: str) -> int:
-            parts = time_str.split(':')
-            return int(parts[0]) * 60 + int(parts[1])
-        
-        target_minutes = time_to_minutes(time_str)
-        
-        # Проверяем результаты для каждого мастера
-        for master_data in masters:
-            # Если указан конкретный мастер, проверяем соответствие
-            if master_id:
-                result_master_id = master_data.get('master_id')
-                if result_master_id != master_id:
-                    continue
-            elif master_name:
-                result_master_name = master_data.get('master_name')
-                
-                if not result_master_name:
-                    continue
+            if result.get('error'):
+                error_message = result['error']
+                logger.warning("Ошибка при проверке доступности времени: %s", error_message)
                 
-                # Используем нечеткое сравнение имен
-                is_match = _is_master_name_match(master_name, result_master_name)
+                # Если это техническая ошибка (429 после всех retry) - вызываем менеджера
+                if result.get('is_technical_error', False):
+                    logger.error("Техническая ошибка API (429) при проверке доступности времени. Вызываем менеджера.")
+                    return _escalate_verification_error(state, booking_state, service_id, slot_time, error_message)
                 
-                if not is_match:
-                    continue
+                # Если это не техническая ошибка - обычная обработка (время недоступно)
+                return _reset_slot_time_reply(
+                    extracted_info,
+                    booking_state,
+                    f"К сожалению, время {time_str} на {formatted_date} недоступно. Давайте выберем другое время?"
+                )
             
-            master_results = master_data.get('results', [])
-            for day_result in master_results:
-                if day_result.get('date') == date_str:
-                    slots = day_result.get('slots', [])
-                    # Проверяем, есть ли нужное время в слотах
-                    for slot in slots:
-                        # Слот может быть в формате "HH:MM" или "HH:MM-HH:MM"
-                        if '-' in slot:
-                            # Интервал: проверяем, попадает ли время в интервал
-                            parts = slot.split('-')
-                            start_time = parts[0].strip()
-                            end_time = parts[1].strip() if len(parts) > 1 else start_time
-                            start_minutes = time_to_minutes(start_time)
-                            end_minutes = time_to_minutes(end_time)
-                            # Время доступно, если оно попадает в интервал (включительно начало, исключительно конец)
-                            if start_minutes <= target_minutes < end_minutes:
-                                time_found = True
-                                break
-                        else:
-                            # Отдельное время: точное совпадение
-                            if slot == time_str:
-                                time_found = True
-                                break
-                    if time_found:
-                        break
-            if time_found:
-                break
+            # Проверяем, есть ли это время в результатах
+            # Структура результата: {"masters": [{"results": [{"date": ..., "slots": [...]}]}]}
+            day_slots = _collect_day_slots(result.get('masters', []), master_id, master_name, date_str)
+            time_found = any(_is_time_in_slots(slots, target_minutes) for _, slots in day_slots)
         
         if time_found:
             # Время доступно - устанавливаем флаг и возвращаем пустой answer
-            logger.info(f"Время {slot_time} доступно, устанавливаем slot_time_verified=True")
-            updated_booking_state = booking_state.copy()
-            updated_booking_state["slot_time_verified"] = True
+            logger.info("Время %s доступно, устанавливаем slot_time_verified=True", slot_time)
             return {
-                "extracted_info": {
-                    **state.get("extracted_info", {}),
-                    "booking": updated_booking_state
-                },
+                "extracted_info": _with_booking(extracted_info, booking_state, slot_time_verified=True),
                 "answer": ""  # Пустой ответ - не пишем клиенту
             }
+        
+        # Время недоступно - сообщаем клиенту и сбрасываем
+        logger.info("Время %s недоступно", slot_time)
+        
+        # Формируем сообщение для пользователя: если на эту дату есть другие слоты,
+        # предлагаем их сразу (они уже получены), без повторного запроса к YClients
+        answer_text = f"К сожалению, время {time_str} на {formatted_date} недоступно."
+        if day_slots:
+            if len(day_slots) == 1:
+                answer_text += f" Свободное время на эту дату: {' | '.join(day_slots[0][1])}."
+            else:
+                answer_text += " Свободное время на эту дату:\n" + "\n".join(
+                    f"{name}: {' | '.join(slots)}" for name, slots in day_slots
+                )
+            answer_text += "\nКакое время Вам подходит?"
         else:
-            # Время недоступно - сообщаем клиенту и сбрасываем
-            logger.info(f"Время {slot_time} недоступно")
-            updated_booking_state = booking_state.copy()
-            updated_booking_state["slot_time"] = None
-            updated_booking_state["slot_time_verified"] = None
-            
-            # Форматируем дату для сообщения
-            try:
-                date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-                formatted_date = date_obj.strftime("%d.%m.%Y")
-            except:
-                formatted_date = date_str
-            
-            # Формируем сообщение для пользователя
-            answer_text = f"К сожалению, время {time_str} на {formatted_date} недоступно. Давайте выберем другое время."
-            
-            # КРИТИЧНО: Создаем AIMessage для сохранения в истории LangGraph
-            new_messages = [AIMessage(content=answer_text)]
-            return {
-                "extracted_info": {
-                    **state.get("extracted_info", {}),
-                    "booking": updated_booking_state
-                },
-                "messages": new_messages,  # КРИТИЧНО: Возвращаем сообщение для сохранения в истории
-                "answer": answer_text
-            }
+            answer_text += " Давайте выберем другое время."
+        
+        return _reset_slot_time_reply(extracted_info, booking_state, answer_text)
             
     except Exception as e:
         error_str = str(e).lower()
         is_technical_error = "429" in error_str or "too many requests" in error_str
         
-        logger.error(f"Ошибка при проверке доступности времени: {e}", exc_info=True)
-        
-        # Если это техническая ошибка (429) - вызываем менеджера
+        # 429 - ожидаемая ошибка внешнего API: traceback печатаем только в DEBUG режиме,
+        # и вызываем менеджера
         if is_technical_error:
-            logger.error(f"Техническая ошибка API (429) при проверке доступности времени. Вызываем менеджера.")
-            try:
-                from ....services.escalation_service import EscalationService
-                
-                chat_id = state.get("chat_id")
-                if not chat_id:
-                    chat_id = "unknown"
-                
-                # Формируем отчет для менеджера
-                manager_report = f"Отчет для менеджера:\n"
-                manager_report += f"Причина: Техническая ошибка API при проверке доступности времени\n"
-                manager_report += f"Ошибка: {str(e)}\n"
-                manager_report += f"Попытка проверки времени: {slot_time}\n"
-                manager_report += f"Service ID: {service_id}\n"
-                master_name = booking_state.get("master_name")
-                if master_name:
-                    manager_report += f"Мастер: {master_name}\n"
-                
-                # Используем EscalationService для формирования ответа
-                escalation_service = EscalationService()
-                call_manager_text = f"[CALL_MANAGER]\n{manager_report}"
-                
-                # Обрабатываем через EscalationService
-                escalation_result = escalation_service.handle(call_manager_text, str(chat_id))
-                
-                # Возвращаем результат с вызовом менеджера
-                return {
-                    "extracted_info": state.get("extracted_info", {}),
-                    "answer": escalation_result.get("user_message", ""),
-                    "manager_alert": escalation_result.get("manager_alert")
-                }
-            except Exception as escalation_error:
-                logger.error(f"Ошибка при вызове менеджера: {escalation_error}", exc_info=True)
-                # Если не удалось вызвать менеджера, возвращаем общее сообщение об ошибке
-                updated_booking_state = booking_state.copy()
-                updated_booking_state["slot_time"] = None
-                updated_booking_state["slot_time_verified"] = None
-                answer_text = "Извините, произошла техническая ошибка. Наш менеджер свяжется с вами в ближайшее время."
-                return {
-                    "extracted_info": {
-                        **state.get("extracted_info", {}),
-                        "booking": updated_booking_state
-                    },
-                    "messages": [AIMessage(content=answer_text)],
-                    "answer": answer_text
-                }
+            logger.error("Техническая ошибка API (429) при проверке доступности времени: %s. Вызываем менеджера.", e)
+            logger.debug("Traceback ошибки проверки доступности времени", exc_info=True)
+            return _escalate_verification_error(state, booking_state, service_id, slot_time, e)
         
+        logger.error("Ошибка при проверке доступности времени: %s", e, exc_info=True)
         # При обычной ошибке сбрасываем время
-        updated_booking_state = booking_state.copy()
-        updated_booking_state["slot_time"] = None
-        updated_booking_state["slot_time_verified"] = None
-        answer_text = "Извините, произошла ошибка при проверке доступности времени. Давайте выберем другое время?"
-        return {
-            "extracted_info": {
-                **state.get("extracted_info", {}),
-                "booking": updated_booking_state
-            },
-            "messages": [AIMessage(content=answer_text)],
-            "answer": answer_text
-        }
+        return _reset_slot_time_reply(
+            extracted_info,
+            booking_state,
+            "Извините, произошла ошибка при проверке доступности времени. Давайте выберем другое время?"
+        )
 
 
-def _find_and_offer_slots(
+async def _find_and_offer_slots(
     state: ConversationState,
     booking_state: Dict[str, Any],
     service_id: int
@@ -558,36 +825,37 @@ def _find_and_offer_slots(
     slot_time = booking_state.get("slot_time")
     user_message = state.get("message", "")
     
-    # Формируем описание пожеланий по времени для промпта
-    time_preference = _extract_time_preference(slot_time, user_message)
+    # Определяем пожелания по времени для промпта
+    time_pref, time_detail = _extract_time_preference(slot_time, user_message)
+    
+    # Относительные даты ("сегодня", "завтра") разрешаем здесь, чтобы промпт
+    # был чистой функцией аргументов и кэшировался
+    date_override = None
+    if time_pref in _PREF_TO_DAY_OFFSET:
+        date_override = _relative_dates(int(time.time() // 60))[_PREF_TO_DAY_OFFSET[time_pref]]
     
     # Формируем системный промпт согласно ТЗ
-    system_prompt = _build_system_prompt(service_id, master_id, master_name, time_preference)
+    system_prompt = _build_system_prompt(service_id, master_id, master_name, time_pref, time_detail, date_override)
     
-    # Получаем сообщение пользователя и историю
+    # Получаем историю
     # Фильтруем историю: оставляем только переписку (user и assistant), без tool messages
     messages = state.get("messages", [])
     history = filter_history_conversation_only(messages) if messages else []
     chat_id = state.get("chat_id")
     
     try:
-        # Создаем регистрацию инструментов
-        tools_registry = ResponsesToolsRegistry()
-        
-        # Регистрируем инструмент FindSlots
-        tools_registry.register_tool(FindSlots)
-        tools_registry.register_tool(CallManager)
-        
-        # Создаем orchestrator
-        config = ResponsesAPIConfig()
+        # Создаем orchestrator: от хода зависит только промпт, инструменты и клиент общие
         orchestrator = ResponsesOrchestrator(
             instructions=system_prompt,
-            tools_registry=tools_registry,
-            config=config
+            tools_registry=_TOOLS_REGISTRY,
+            client=_get_client(),
+            config=_CONFIG
         )
         
         # Запускаем один ход диалога
-        result = orchestrator.run_turn(
+        # run_turn синхронный (LLM и инструменты), выполняем его в потоке, чтобы не блокировать event loop
+        result = await asyncio.to_thread(
+            orchestrator.run_turn,
             user_message=user_message,
             history=history,
             chat_id=chat_id
@@ -596,6 +864,9 @@ def _find_and_offer_slots(
         # Получаем ответ
         reply = result.get("reply", "")
         tool_calls = result.get("tool_calls", [])
+        # Формируем список использованных инструментов и результаты один раз для всех веток
+        used_tools = [tc.get("name") for tc in tool_calls] if tool_calls else []
+        tool_results = tool_calls or []
         
         # Преобразуем новые сообщения из orchestrator в BaseMessage объекты
         new_messages_dicts = result.get("new_messages", [])
@@ -608,19 +879,16 @@ def _find_and_offer_slots(
                 "messages": new_messages,  # КРИТИЧНО: Возвращаем все новые сообщения
                 "answer": result.get("reply", ""),
                 "manager_alert": result.get("manager_alert"),
-                "used_tools": [tc.get("name") for tc in tool_calls] if tool_calls else [],
-                "tool_results": tool_calls if tool_calls else []
+                "used_tools": used_tools,
+                "tool_results": tool_results
             }
         
-        # Получаем текущее состояние для проверки JSON
-        extracted_info = state.get("extracted_info") or {}
-        booking_state_current = extracted_info.get("booking", {})
-        
         # Проверяем, есть ли JSON в ответе для обновления состояния
+        # (booking_state - это booking из state["extracted_info"], см. slot_manager_node)
         updated_extracted_info = try_update_booking_state_from_reply(
             reply=reply,
-            current_booking_state=booking_state_current,
-            extracted_info=extracted_info
+            current_booking_state=booking_state,
+            extracted_info=state["extracted_info"]
         )
         
         # Если JSON найден и состояние обновлено - не отправляем сообщение клиенту
@@ -630,111 +898,83 @@ def _find_and_offer_slots(
                 "messages": new_messages,
                 "answer": "",  # Пустой answer - процесс продолжается автоматически
                 "extracted_info": updated_extracted_info,
-                "used_tools": [tc.get("name") for tc in tool_calls] if tool_calls else [],
-                "tool_results": tool_calls if tool_calls else []
+                "used_tools": used_tools,
+                "tool_results": tool_results
             }
         
-        # Формируем список использованных инструментов
-        used_tools = [tc.get("name") for tc in tool_calls] if tool_calls else []
-        
-        logger.info(f"Slot manager ответил: {reply[:100]}...")
-        logger.info(f"Использованные инструменты: {used_tools}")
+        logger.info("Slot manager ответил: %.100s...", reply)
+        logger.info("Использованные инструменты: %s", used_tools)
         
         return {
             "messages": new_messages,  # КРИТИЧНО: Возвращаем все новые сообщения (AIMessage с tool_calls и ToolMessage)
             "answer": reply,
             "used_tools": used_tools,
-            "tool_results": tool_calls if tool_calls else []
+            "tool_results": tool_results
         }
         
     except Exception as e:
-        logger.error(f"Ошибка в slot_manager_node: {e}", exc_info=True)
+        logger.error("Ошибка в slot_manager_node: %s", e, exc_info=True)
         return {
             "answer": "Извините, произошла ошибка при поиске доступного времени. Попробуйте еще раз."
         }
 
 
+@functools.lru_cache(maxsize=256)
 def _build_system_prompt(
     service_id: int,
     master_id: Optional[int],
     master_name: Optional[str],
-    time_preference: str
+    time_pref: TimePref,
+    time_detail: Tuple[str, ...],
+    date_override: Optional[str] = None
 ) -> str:
     """
     Формирует системный промпт для узла slot_manager согласно ТЗ
     
+    Результат зависит только от аргументов, поэтому кэшируется.
+    
     Args:
         service_id: ID выбранной услуги
         master_id: ID мастера (если есть)
         master_name: Имя мастера (если есть)
-        time_preference: Пожелания клиента по времени
+        time_pref: Тип пожелания клиента по времени
+        time_detail: Детали пожелания (см. _extract_time_preference)
+        date_override: Дата "YYYY-MM-DD" для пожеланий "сегодня/завтра/послезавтра" (вычисляется вызывающим)
         
     Returns:
         Системный промпт для LLM
     """
     # Формируем части контекста
-    master_info = ""
     if master_id:
-        master_info = f"{master_id}"
-        if master_name:
-            master_info += f" ({master_name})"
-    elif master_name:
-        master_info = master_name
+        master_info = f"{master_id} ({master_name})" if master_name else f"{master_id}"
+    else:
+        master_info = master_name or ""
     
+    time_preference = _describe_time_preference(time_pref, time_detail)
     time_info = time_preference if time_preference else "не указаны"
     
-    # Формируем инструкции по параметрам для FindSlots
-    params_instructions = f"- service_id: MANDATORY pass {service_id}\n"
+    # Формируем инструкции по параметрам для FindSlots (каждая строка заканчивается "\n")
+    params_parts = [f"- service_id: MANDATORY pass {service_id}\n"]
     if master_id:
-        params_instructions += f"- master_id: pass {master_id}\n"
+        params_parts.append(f"- master_id: pass {master_id}\n")
     elif master_name:
-        params_instructions += f"- master_name: pass '{master_name}'\n"
-    
-    if time_preference:
-        # Преобразуем пожелания в формат для инструмента
-        if "После" in time_preference and ":" in time_preference:
-            # Извлекаем время после "После"
-            time_part = time_preference.split("После")[1].strip()
-            params_instructions += f"- time_period: pass 'after {time_part}'\n"
-        elif "До" in time_preference and ":" in time_preference:
-            # Извлекаем время после "До"
-            time_part = time_preference.split("До")[1].strip()
-            params_instructions += f"- time_period: pass 'before {time_part}'\n"
-        elif "Утром" in time_preference:
-            params_instructions += "- time_period: pass 'morning'\n"
-        elif "Днем" in time_preference or "Днём" in time_preference:
-            params_instructions += "- time_period: pass 'day'\n"
-        elif "Вечером" in time_preference:
-            params_instructions += "- time_period: pass 'evening'\n"
-        elif "Завтра" in time_preference:
-            from datetime import datetime, timedelta
-            tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-            params_instructions += f"- date: pass '{tomorrow}'\n"
-        elif "Послезавтра" in time_preference:
-            from datetime import datetime, timedelta
-            day_after_tomorrow = (datetime.now() + timedelta(days=2)).strftime("%Y-%m-%d")
-            params_instructions += f"- date: pass '{day_after_tomorrow}'\n"
-        elif "Сегодня" in time_preference:
-            from datetime import datetime
-            today = datetime.now().strftime("%Y-%m-%d")
-            params_instructions += f"- date: pass '{today}'\n"
-        elif "Конкретная дата" in time_preference or "Конкретное время" in time_preference:
-            # Если есть конкретное время, извлекаем дату
-            if ":" in time_preference:
-                # Пытаемся извлечь дату из формата "YYYY-MM-DD"
-                import re
-                date_match = re.search(r'(\d{4}-\d{2}-\d{2})', time_preference)
-                if date_match:
-                    params_instructions += f"- date: pass '{date_match.group(1)}'\n"
-    
-    prompt = f"""You are an AI administrator of the LookTown beauty salon. Currently at the service selection stage.
+        params_parts.append(f"- master_name: pass '{master_name}'\n")
+    
+    # Преобразуем пожелания в формат для инструмента
+    param_builder = _PARAM_BUILDERS.get(time_pref)
+    if param_builder:
+        params_parts.append(param_builder(time_detail, date_override))
+    params_instructions = "".join(params_parts)
+    
+    # Статический шаблон (константа кода), подставляются только динамические части
+    prompt = """You are an AI administrator of the LookTown beauty salon. Currently at the service selection stage.
 Your communication style is friendly, professional, brief. Address clients with "вы" (formal you), from a female perspective.
 YOU ARE STRICTLY FORBIDDEN TO ASK THE CLIENT ABOUT THE DESIRED SERVICE, CONTACT DETAILS OR SAY THAT YOU BOOKED THEM FOR A SERVICE.
 YOU ARE STRICTLY FORBIDDEN TO MAKE UP AVAILABLE SLOTS, TAKE THEM ONLY FROM THE `FindSlots` TOOL.
 
 CONTEXT:
 - Selected service ID: {service_id}
-- Selected master: {master_info if master_info else "не выбран"}
+- Selected master: {master_info}
 - Client's time preferences: {time_info}
 
    The client has chosen a service. MANDATORY use the `FindSlots` tool right now, write to them strictly the output from the tool without changing the wording.
@@ -746,8 +986,12 @@ PARAMETERS FOR FindSlots:
 3 If the client chose a slot (including if they named a master who has only one available slot, return ONLY JSON with the service time in the format:  {{"slot_time": "YYYY-MM-DD HH:MM"}}  NEVER SEND {{"service_id": }}
 If there are no available slots, tell the client about it, suggest selecting other slots or time. NEVER MAKE UP AVAILABLE SLOTS, TAKE THEM ONLY FROM THE `FindSlots` TOOL.
 If you encounter a system error, don't know the answer to a question, or the client is dissatisfied - call the manager (if you already called the manager, don't call it again, continue the conversation).
- (if you already called the manager, don't call it again, continue the conversation).
 """
     
-    return prompt
+    return prompt.format_map({
+        "service_id": service_id,
+        "master_info": master_info or "не выбран",
+        "time_info": time_info,
+        "params_instructions": params_instructions,
+    })
 
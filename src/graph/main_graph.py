@@ -1,20 +1,59 @@
 """
 Основной граф состояний для обработки всех стадий диалога (Responses API)
 """
-from typing import Literal
+import asyncio
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Literal, Optional, TypedDict
 from langgraph.graph import StateGraph, START, END
 from .conversation_state import ConversationState
 from .utils import messages_to_history, filter_history_for_stage_detector
-from ..agents.stage_detector_agent import StageDetectorAgent
-from ..agents.booking_agent import BookingAgent
-from ..agents.cancel_booking_agent import CancelBookingAgent
-from ..agents.reschedule_agent import RescheduleAgent
-from ..agents.view_my_booking_agent import ViewMyBookingAgent
-from ..agents.about_salon_agent import AboutSalonAgent
-
 from ..services.langgraph_service import LangGraphService
 from ..services.logger_service import logger
 
+# Стадия берется из ответа stage_detector.run() (один запрос к LLM за ход).
+# STAGE_DETECTOR_SINGLE_CALL=false возвращает прежний повторный вызов detect_stage
+_STAGE_DETECTOR_SINGLE_CALL = os.getenv("STAGE_DETECTOR_SINGLE_CALL", "true").lower() != "false"
+# Сколько последних сообщений истории видит StageDetector
+_STAGE_DETECTOR_HISTORY_LIMIT = 10
+# Пока идет бронирование (услуга выбрана, запись не создана), стадия booking
+# сохраняется без запроса к StageDetector. Выключено по умолчанию,
+# STAGE_DETECTOR_STICKY_BOOKING=true включает
+_STAGE_DETECTOR_STICKY_BOOKING = os.getenv("STAGE_DETECTOR_STICKY_BOOKING", "false").lower() == "true"
+# Слова, по которым клиент может уйти со стадии бронирования - тогда стадию определяет LLM.
+# Покрывают все триггеры других агентов из инструкции StageDetectorAgent
+_TOPIC_SWITCH_RE = re.compile(
+    # cancellation_request / reschedule
+    r"отмен|перен[её]с|перенос|опазд|задерж"
+    # view_my_booking
+    r"|мо[иея] запис|у меня запис|записан"
+    # about_salon
+    r"|салон|адрес|где вы|где наход|телефон|контакт|связат|инстаграм|instagram|соцсет|социальн"
+    # эскалация
+    r"|менеджер|администратор|оператор|жалоб",
+    re.IGNORECASE
+)
+# Стадии, для которых есть узел-обработчик
+_VALID_STAGES = frozenset((
+    "booking",
+    "cancellation_request", "reschedule", "view_my_booking", "about_salon"
+))
+
+
+class HandlerResult(TypedDict, total=False):
+    """Обновление состояния, которое возвращают узлы-обработчики агентов"""
+    messages: list
+    answer: str
+    manager_alert: Optional[str]
+    agent_name: str
+    used_tools: List[str]
+    tool_results: List[Dict[str, Any]]
+
+
+# Последний скомпилированный граф для каждого сервиса (см. create_main_graph)
+_main_graph_cache: "OrderedDict[LangGraphService, MainGraph]" = OrderedDict()
+
 
 def create_main_graph(langgraph_service: LangGraphService, checkpointer):
     """
@@ -32,15 +71,56 @@ def create_main_graph(langgraph_service: LangGraphService, checkpointer):
     """
     if checkpointer is None:
         raise ValueError("checkpointer обязателен для работы с PostgreSQL. Граф должен компилироваться с checkpointer.")
+    
+    # Граф компилируется заново только если сменился checkpointer: узлы MainGraph
+    # передают свой checkpointer в BookingAgent, поэтому граф привязан к нему
+    main_graph = _main_graph_cache.get(langgraph_service)
+    if main_graph is not None and main_graph.checkpointer is checkpointer:
+        _main_graph_cache.move_to_end(langgraph_service)
+        return main_graph.compiled_graph
+    
     main_graph = MainGraph(langgraph_service, checkpointer=checkpointer)
+    _main_graph_cache[langgraph_service] = main_graph
+    _main_graph_cache.move_to_end(langgraph_service)
+    if len(_main_graph_cache) > MainGraph._AGENTS_CACHE_MAXSIZE:
+        _main_graph_cache.popitem(last=False)
     return main_graph.compiled_graph
 
 
+def _create_agents(langgraph_service: LangGraphService) -> dict:
+    """
+    Создает агентов для узлов графа
+    
+    Модули агентов (инструменты, схемы pydantic, клиенты API) импортируются здесь,
+    а не при импорте main_graph: так они загружаются при создании первого графа,
+    а не при старте процесса.
+    """
+    from ..agents.stage_detector_agent import StageDetectorAgent
+    from ..agents.booking_agent import BookingAgent
+    from ..agents.cancel_booking_agent import CancelBookingAgent
+    from ..agents.reschedule_agent import RescheduleAgent
+    from ..agents.view_my_booking_agent import ViewMyBookingAgent
+    from ..agents.about_salon_agent import AboutSalonAgent
+    
+    return {
+        'stage_detector': StageDetectorAgent(langgraph_service),
+        'booking': BookingAgent(langgraph_service),  # Без checkpointer при создании
+        'cancellation_request': CancelBookingAgent(langgraph_service),
+        'reschedule': RescheduleAgent(langgraph_service),
+        'view_my_booking': ViewMyBookingAgent(langgraph_service),
+        'about_salon': AboutSalonAgent(langgraph_service),
+    }
+
+
 class MainGraph:
     """Основной граф состояний для обработки всех стадий диалога"""
     
-    # Кэш для агентов (чтобы не создавать их заново при каждом создании графа)
-    _agents_cache = {}
+    # Кэш для агентов (чтобы не создавать их заново при каждом создании графа).
+    # Ключ - сам объект langgraph_service, а не id(): id освободившегося объекта может
+    # достаться новому сервису, и тот получил бы чужих агентов. Слабые ссылки не помогут -
+    # агенты сами ссылаются на сервис, поэтому размер кэша ограничен (вытесняются старые)
+    _agents_cache: "OrderedDict[LangGraphService, dict]" = OrderedDict()
+    _AGENTS_CACHE_MAXSIZE = 20
     
     @classmethod
     def clear_cache(cls):
@@ -67,19 +147,19 @@ class MainGraph:
         self.checkpointer = checkpointer
         
         # Используем кэш для агентов
-        cache_key = id(langgraph_service)
+        cache_key = langgraph_service
         
         if cache_key not in MainGraph._agents_cache:
             # Создаём агентов только если их ещё нет в кэше
             # ВАЖНО: BookingAgent НЕ получает checkpointer при создании, он будет передаваться динамически
-            MainGraph._agents_cache[cache_key] = {
-                'stage_detector': StageDetectorAgent(langgraph_service),
-                'booking': BookingAgent(langgraph_service),  # Без checkpointer при создании
-                'cancellation_request': CancelBookingAgent(langgraph_service),
-                'reschedule': RescheduleAgent(langgraph_service),
-                'view_my_booking': ViewMyBookingAgent(langgraph_service),
-                'about_salon': AboutSalonAgent(langgraph_service),
-            }
+            # Параллельное выполнение инструментов включает сам агент (parallel_tools в BaseAgent) -
+            # только там, где инструменты не изменяют записи
+            MainGraph._agents_cache[cache_key] = _create_agents(langgraph_service)
+            
+            if len(MainGraph._agents_cache) > MainGraph._AGENTS_CACHE_MAXSIZE:
+                MainGraph._agents_cache.popitem(last=False)
+        else:
+            MainGraph._agents_cache.move_to_end(cache_key)
         
         # Используем агентов из кэша
         agents = MainGraph._agents_cache[cache_key]
@@ -128,35 +208,42 @@ class MainGraph:
         graph.add_edge("handle_about_salon", END)
         return graph
     
-    def _detect_stage(self, state: ConversationState) -> ConversationState:
+    async def _detect_stage(self, state: ConversationState) -> ConversationState:
         """Узел определения стадии (Silent Node - не добавляет messages в историю)"""
+        message = state["message"]
+        if _STAGE_DETECTOR_STICKY_BOOKING and self._is_booking_in_progress(state, message):
+            logger.info("Бронирование в процессе, стадия booking без StageDetector")
+            return {"stage": "booking"}
+        
         logger.info("Определение стадии диалога")
         
-        message = state["message"]
         # Преобразуем messages в history для обратной совместимости с агентами
-        messages = state.get("messages", [])
-        history = messages_to_history(messages) if messages else None
+        # StageDetector видит только последние сообщения, поэтому преобразуем только их,
+        # а не всю историю диалога (результат тот же, фильтр все равно берет хвост)
+        messages = state["messages"]
+        history = messages_to_history(messages[-_STAGE_DETECTOR_HISTORY_LIMIT:]) if messages else None
         
         # Фильтруем историю для StageDetector: удаляем tool сообщения и ограничиваем до 10 последних
         if history:
-            history = filter_history_for_stage_detector(history, max_messages=10)
+            history = filter_history_for_stage_detector(history, max_messages=_STAGE_DETECTOR_HISTORY_LIMIT)
             # Удаляем последнее user сообщение, так как текущее message передается отдельно
             # Это предотвращает дублирование в orchestrator
             if history and history[-1].get("role") == "user":
                 history = history[:-1]
         
-        chat_id = state.get("chat_id")
+        chat_id = state["chat_id"]
         
         # Используем новый метод run() для получения всех сообщений
-        result = self.stage_detector.run(message, history, chat_id=chat_id)
+        # run синхронный (LLM), выполняем его в потоке, чтобы не блокировать event loop
+        result = await asyncio.to_thread(self.stage_detector.run, message, history, chat_id=chat_id)
         
         # Получаем все новые сообщения из результата (но НЕ возвращаем их в messages)
         new_messages = result.get("messages", [])
         
         # Проверяем, был ли вызван CallManager
         if result.get("call_manager"):
-            escalation_result = self.stage_detector._call_manager_result if hasattr(self.stage_detector, '_call_manager_result') and self.stage_detector._call_manager_result else {}
-            logger.info(f"CallManager был вызван в StageDetectorAgent, chat_id: {chat_id}")
+            escalation_result = self.stage_detector._call_manager_result or {}
+            logger.info("CallManager был вызван в StageDetectorAgent, chat_id: %s", chat_id)
             
             # Получаем полную информацию о tool_calls (если есть)
             tool_results = result.get("tool_calls", [])
@@ -172,43 +259,82 @@ class MainGraph:
                 "tool_results": tool_results,
             }
         
-        # Определяем стадию через detect_stage (для обратной совместимости)
-        stage_detection = self.stage_detector.detect_stage(message, history, chat_id=chat_id)
+        if _STAGE_DETECTOR_SINGLE_CALL:
+            # Стадия уже распознана из ответа run() - повторный запрос к LLM не нужен
+            stage = result["stage"]
+        else:
+            # Определяем стадию через detect_stage (для обратной совместимости)
+            stage_detection = await asyncio.to_thread(self.stage_detector.detect_stage, message, history, chat_id=chat_id)
+            stage = stage_detection.stage
         
         # ВАЖНО: Роутер - это "тихий" узел, он НЕ должен добавлять промежуточные сообщения в историю
         # Возвращаем только stage для маршрутизации
         return {
-            "stage": stage_detection.stage
+            "stage": stage
             # НЕ возвращаем messages - это промежуточные "размышления" роутера, не нужные в истории
         }
     
+    @staticmethod
+    def _is_booking_in_progress(state: ConversationState, message: str) -> bool:
+        """
+        Проверяет, что прошлый ход был на стадии booking и запись еще не завершена
+        
+        Args:
+            state: Текущее состояние графа (stage восстановлен из checkpointer)
+            message: Сообщение пользователя
+            
+        Returns:
+            True, если стадию можно оставить booking без запроса к LLM
+        """
+        if state.get("stage") != "booking":
+            return False
+        booking = (state.get("extracted_info") or {}).get("booking") or {}
+        if not booking.get("service_id") or booking.get("is_finalized"):
+            return False
+        return _TOPIC_SWITCH_RE.search(message) is None
+    
     def _route_after_detect(self, state: ConversationState) -> Literal[
         "booking",
         "cancellation_request", "reschedule", "view_my_booking", "about_salon", "end"
     ]:
         """Маршрутизация после определения стадии"""
         # Если CallManager был вызван, завершаем граф
-        if state.get("answer") and state.get("manager_alert"):
+        if state["answer"] and state.get("manager_alert"):
             logger.info("CallManager был вызван в StageDetectorAgent, завершаем граф")
             return "end"
         
         # Иначе маршрутизируем по стадии
         stage = state.get("stage", "booking")
-        logger.info(f"Маршрутизация на стадию: {stage}")
+        logger.info("Маршрутизация на стадию: %s", stage)
         
         # Валидация стадии
-        valid_stages = [
-            "booking",
-            "cancellation_request", "reschedule", "view_my_booking", "about_salon"
-        ]
-        
-        if stage not in valid_stages:
-            logger.warning(f"⚠️ Неизвестная стадия: {stage}, устанавливаю booking")
+        if stage not in _VALID_STAGES:
+            logger.warning("⚠️ Неизвестная стадия: %s, устанавливаю booking", stage)
             return "booking"
         
         return stage
     
-    def _process_agent_result(self, agent, message: str, history, chat_id: str, state: ConversationState, agent_name: str) -> ConversationState:
+    async def _run_agent(self, agent, state: ConversationState, agent_name: str) -> HandlerResult:
+        """
+        Запускает агента на текущем сообщении и истории из состояния графа
+        
+        Args:
+            agent: Экземпляр агента
+            state: Текущее состояние графа
+            agent_name: Имя агента
+            
+        Returns:
+            Обновленное состояние графа (см. _process_agent_result)
+        """
+        message = state["message"]
+        # Преобразуем messages в history для обратной совместимости с агентами
+        messages = state["messages"]
+        history = messages_to_history(messages) if messages else None
+        chat_id = state["chat_id"]
+        
+        return await self._process_agent_result(agent, message, history, chat_id, state, agent_name)
+    
+    async def _process_agent_result(self, agent, message: str, history, chat_id: str, state: ConversationState, agent_name: str) -> HandlerResult:
         """
         Обработка результата агента с проверкой на CallManager
         
@@ -224,7 +350,8 @@ class MainGraph:
             Обновленное состояние графа с messages из orchestrator
         """
         # Используем новый метод run() для получения всех сообщений
-        result = agent.run(message, history, chat_id=chat_id)
+        # run синхронный (LLM и инструменты), выполняем его в потоке, чтобы не блокировать event loop
+        result = await asyncio.to_thread(agent.run, message, history, chat_id=chat_id)
         
         # Получаем все новые сообщения из результата
         new_messages = result.get("messages", [])
@@ -233,82 +360,50 @@ class MainGraph:
         tool_results = result.get("tool_calls", [])
         used_tools = [tool.get("name") for tool in tool_results] if tool_results else []
         
-        # Проверяем, был ли вызван CallManager через инструмент
-        if result.get("call_manager"):
-            escalation_result = agent._call_manager_result if hasattr(agent, '_call_manager_result') and agent._call_manager_result else {}
-            chat_id = state.get("chat_id", "unknown")
-            
-            logger.info(f"CallManager был вызван через инструмент в агенте {agent_name}, chat_id: {chat_id}")
-            
-            return {
-                "messages": new_messages,  # КРИТИЧНО: Возвращаем все новые сообщения
-                "answer": escalation_result.get("user_message", result.get("reply", "")),
-                "manager_alert": escalation_result.get("manager_alert", result.get("manager_alert")),
-                "agent_name": agent_name,
-                "used_tools": used_tools,
-                "tool_results": tool_results,
-            }
-        
-        # Обычный ответ агента
-        answer = result.get("reply", "")
-        
-        return {
-            "messages": new_messages,  # КРИТИЧНО: Возвращаем все новые сообщения (AIMessage с tool_calls и ToolMessage)
-            "answer": answer,
+        # Ответ агента. КРИТИЧНО: Возвращаем все новые сообщения (AIMessage с tool_calls и ToolMessage)
+        update: HandlerResult = {
+            "messages": new_messages,
+            "answer": result.get("reply", ""),
             "agent_name": agent_name,
             "used_tools": used_tools,
             "tool_results": tool_results,
         }
+        
+        # Проверяем, был ли вызван CallManager через инструмент
+        if result.get("call_manager"):
+            escalation_result = agent._call_manager_result or {}
+            logger.info("CallManager был вызван через инструмент в агенте %s, chat_id: %s", agent_name, chat_id)
+            
+            update["answer"] = escalation_result.get("user_message", update["answer"])
+            update["manager_alert"] = escalation_result.get("manager_alert", result.get("manager_alert"))
+        
+        return update
     
-    def _handle_booking(self, state: ConversationState) -> ConversationState:
+    async def _handle_booking(self, state: ConversationState) -> ConversationState:
         """Обработка бронирования через граф состояний"""
         logger.info("Обработка бронирования через граф")
         
         # КРИТИЧНО: передаем checkpointer в process_booking для создания графа с активным пулом
         # Это необходимо, так как checkpointer привязан к пулу соединений, который должен быть активен
-        return self.booking_agent.process_booking(state, checkpointer=self.checkpointer)
+        return await self.booking_agent.process_booking(state, checkpointer=self.checkpointer)
     
-    def _handle_cancellation_request(self, state: ConversationState) -> ConversationState:
+    async def _handle_cancellation_request(self, state: ConversationState) -> ConversationState:
         """Обработка отмены"""
         logger.info("Обработка отмены")
-        message = state["message"]
-        # Преобразуем messages в history для обратной совместимости с агентами
-        messages = state.get("messages", [])
-        history = messages_to_history(messages) if messages else None
-        chat_id = state.get("chat_id")
-        
-        return self._process_agent_result(self.cancel_agent, message, history, chat_id, state, "CancelBookingAgent")
+        return await self._run_agent(self.cancel_agent, state, "CancelBookingAgent")
     
-    def _handle_reschedule(self, state: ConversationState) -> ConversationState:
+    async def _handle_reschedule(self, state: ConversationState) -> ConversationState:
         """Обработка переноса"""
         logger.info("Обработка переноса")
-        message = state["message"]
-        # Преобразуем messages в history для обратной совместимости с агентами
-        messages = state.get("messages", [])
-        history = messages_to_history(messages) if messages else None
-        chat_id = state.get("chat_id")
-        
-        return self._process_agent_result(self.reschedule_agent, message, history, chat_id, state, "RescheduleAgent")
+        return await self._run_agent(self.reschedule_agent, state, "RescheduleAgent")
     
-    def _handle_view_my_booking(self, state: ConversationState) -> ConversationState:
+    async def _handle_view_my_booking(self, state: ConversationState) -> ConversationState:
         """Обработка просмотра записей"""
         logger.info("Обработка просмотра записей")
-        message = state["message"]
-        # Преобразуем messages в history для обратной совместимости с агентами
-        messages = state.get("messages", [])
-        history = messages_to_history(messages) if messages else None
-        chat_id = state.get("chat_id")
-        
-        return self._process_agent_result(self.view_my_booking_agent, message, history, chat_id, state, "ViewMyBookingAgent")
+        return await self._run_agent(self.view_my_booking_agent, state, "ViewMyBookingAgent")
     
-    def _handle_about_salon(self, state: ConversationState) -> ConversationState:
+    async def _handle_about_salon(self, state: ConversationState) -> ConversationState:
         """Обработка запросов о салоне"""
         logger.info("Обработка запросов о салоне")
-        message = state["message"]
-        # Преобразуем messages в history для обратной совместимости с агентами
-        messages = state.get("messages", [])
-        history = messages_to_history(messages) if messages else None
-        chat_id = state.get("chat_id")
-        
-        return self._process_agent_result(self.about_salon_agent, message, history, chat_id, state, "AboutSalonAgent")
+        return await self._run_agent(self.about_salon_agent, state, "AboutSalonAgent")
 
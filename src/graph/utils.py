@@ -5,11 +5,23 @@ import json
 from typing import List, Dict, Any, Optional
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage, SystemMessage
 
+# orjson приходит транзитивно с langchain-core (через langsmith) и разбирает JSON быстрее.
+# orjson.JSONDecodeError - подкласс json.JSONDecodeError, поэтому обработка ошибок общая
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
 
 def dicts_to_messages(messages_dicts: List[Dict[str, Any]]) -> List[BaseMessage]:
     """
     Преобразует словари сообщений из orchestrator в объекты BaseMessage для LangGraph
     
+    Сообщения пользователя и системы (строка content) создаются через model_construct
+    без валидации Pydantic. AIMessage и ToolMessage создаются обычным конструктором:
+    его валидаторы приводят tool_call_id к строке, проверяют content и нормализуют
+    tool_calls, а ошибка в данных проявляется здесь, а не при сериализации в checkpointer.
+    
     Args:
         messages_dicts: Список словарей с полями role, content, tool_calls, tool_call_id
         
@@ -23,40 +35,85 @@ def dicts_to_messages(messages_dicts: List[Dict[str, Any]]) -> List[BaseMessage]
         content = msg.get("content", "")
         
         if role == "user":
-            langgraph_messages.append(HumanMessage(content=content))
+            langgraph_messages.append(HumanMessage.model_construct(content=content))
         elif role == "assistant":
-            ai_msg = AIMessage(content=content)
-            if msg.get("tool_calls"):
-                tool_calls = []
-                for tc in msg.get("tool_calls", []):
-                    if isinstance(tc, dict):
-                        func_dict = tc.get("function", {})
-                        func_name = func_dict.get("name", "")
-                        func_args_str = func_dict.get("arguments", "{}")
-                        try:
-                            func_args = json.loads(func_args_str) if isinstance(func_args_str, str) else func_args_str
-                        except json.JSONDecodeError:
-                            func_args = {}
-                        tool_calls.append({
-                            "name": func_name,
-                            "args": func_args,
-                            "id": tc.get("id", ""),
-                        })
-                    else:
-                        tool_calls.append(tc)
-                ai_msg.tool_calls = tool_calls
-            langgraph_messages.append(ai_msg)
+            tool_calls = []
+            for tc in msg.get("tool_calls") or []:
+                if isinstance(tc, dict):
+                    func_dict = tc.get("function", {})
+                    func_name = func_dict.get("name", "")
+                    func_args_str = func_dict.get("arguments", "{}")
+                    try:
+                        func_args = _json_loads(func_args_str) if isinstance(func_args_str, str) else func_args_str
+                    except json.JSONDecodeError:
+                        func_args = {}
+                    tool_calls.append({
+                        "name": func_name,
+                        "args": func_args,
+                        "id": tc.get("id", ""),
+                        "type": "tool_call",
+                    })
+                else:
+                    tool_calls.append(tc)
+            langgraph_messages.append(AIMessage(content=content, tool_calls=tool_calls))
         elif role == "tool":
             langgraph_messages.append(ToolMessage(
                 content=content,
                 tool_call_id=msg.get("tool_call_id", "")
             ))
         elif role == "system":
-            langgraph_messages.append(SystemMessage(content=content))
+            langgraph_messages.append(SystemMessage.model_construct(content=content))
     
     return langgraph_messages
 
 
+# Роль по полю type - для классов сообщений без своего конвертера (например, чанков)
+_ROLE_BY_TYPE = {"ai": "assistant", "system": "system", "tool": "tool", "human": "user"}
+
+
+def _human_to_history_entry(msg: HumanMessage) -> Dict[str, Any]:
+    return {"role": "user", "content": msg.content}
+
+
+def _ai_to_history_entry(msg: AIMessage) -> Dict[str, Any]:
+    return {"role": "assistant", "content": msg.content}
+
+
+def _system_to_history_entry(msg: SystemMessage) -> Dict[str, Any]:
+    return {"role": "system", "content": msg.content}
+
+
+def _tool_to_history_entry(msg: ToolMessage) -> Dict[str, Any]:
+    return {"role": "tool", "content": msg.content, "tool_call_id": msg.tool_call_id}
+
+
+def _dict_to_history_entry(msg: Dict[str, Any]) -> Dict[str, Any]:
+    msg_dict = {"role": msg.get("role", "user"), "content": msg.get("content", "")}
+    if msg.get("role") == "tool" and msg.get("tool_call_id"):
+        msg_dict["tool_call_id"] = msg.get("tool_call_id")
+    return msg_dict
+
+
+def _other_to_history_entry(msg: Any) -> Dict[str, Any]:
+    """Сообщение другого класса - роль определяется по полю type"""
+    role = _ROLE_BY_TYPE.get(getattr(msg, "type", "human"), "user")
+    msg_dict = {"role": role, "content": getattr(msg, "content", "")}
+    if role == "tool" and hasattr(msg, "tool_call_id"):
+        msg_dict["tool_call_id"] = getattr(msg, "tool_call_id", "")
+    return msg_dict
+
+
+# Конвертер в словарь истории по точному классу сообщения (одна проверка type(msg) на сообщение).
+# Тип уже известен, поэтому конвертеры читают поля напрямую, без hasattr/getattr
+_HISTORY_CONVERTERS = {
+    HumanMessage: _human_to_history_entry,
+    AIMessage: _ai_to_history_entry,
+    SystemMessage: _system_to_history_entry,
+    ToolMessage: _tool_to_history_entry,
+    dict: _dict_to_history_entry,
+}
+
+
 def messages_to_history(messages: List[BaseMessage | Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Преобразует список BaseMessage объектов или словарей в список словарей для обратной совместимости.
@@ -65,106 +122,27 @@ def messages_to_history(messages: List[BaseMessage | Dict[str, Any]]) -> List[Di
     if not messages:
         return []
     
-    history = []
-    for msg in messages:
-        if isinstance(msg, dict):
-            msg_dict = {"role": msg.get("role", "user"), "content": msg.get("content", "")}
-            if msg.get("role") == "tool" and msg.get("tool_call_id"):
-                msg_dict["tool_call_id"] = msg.get("tool_call_id")
-            history.append(msg_dict)
-        else:
-            role_map = {"ai": "assistant", "system": "system", "tool": "tool", "human": "user"}
-            role = role_map.get(getattr(msg, "type", "human"), "user")
-            msg_dict = {"role": role, "content": getattr(msg, "content", "")}
-            if role == "tool" and hasattr(msg, "tool_call_id"):
-                msg_dict["tool_call_id"] = getattr(msg, "tool_call_id", "")
-            history.append(msg_dict)
-    return history
+    converters = _HISTORY_CONVERTERS
+    return [converters.get(type(msg), _other_to_history_entry)(msg) for msg in messages]
 
 
-def _extract_call_manager_messages(messages: List[Dict[str, Any] | BaseMessage]) -> List[Dict[str, Any]]:
+def _collect_call_manager_ids(tool_calls: Optional[List[Any]], call_manager_ids: set) -> None:
     """
-    Извлекает все сообщения, связанные с CallManager (AIMessage с tool_calls CallManager и соответствующие ToolMessage)
+    Добавляет в call_manager_ids id вызовов CallManager из tool_calls сообщения ассистента
     
     Args:
-        messages: Список сообщений (словари или BaseMessage)
-        
-    Returns:
-        Список сообщений CallManager в формате словарей
+        tool_calls: tool_calls сообщения (словари или объекты)
+        call_manager_ids: Множество, которое пополняется
     """
-    call_manager_messages = []
-    call_manager_ids = set()
-    
-    # Сначала находим все tool_call_id для CallManager
-    for msg in messages:
-        if isinstance(msg, dict):
-            role = msg.get("role")
-            tool_calls = msg.get("tool_calls", [])
-        else:
-            role_map = {"ai": "assistant", "system": "system", "tool": "tool", "human": "user"}
-            role = role_map.get(getattr(msg, "type", "human"), "user")
-            tool_calls = getattr(msg, "tool_calls", [])
-        
-        # Проверяем AIMessage с tool_calls
-        if role == "assistant" and tool_calls:
-            for tc in tool_calls:
-                if isinstance(tc, dict):
-                    tool_name = tc.get("name", "")
-                else:
-                    tool_name = getattr(tc, "name", "")
-                
-                if tool_name == "CallManager":
-                    # Сохраняем ID этого tool_call
-                    if isinstance(tc, dict):
-                        call_id = tc.get("id", "")
-                    else:
-                        call_id = getattr(tc, "id", "")
-                    if call_id:
-                        call_manager_ids.add(call_id)
-    
-    # Теперь собираем все сообщения CallManager
-    for msg in messages:
-        if isinstance(msg, dict):
-            role = msg.get("role")
-            tool_calls = msg.get("tool_calls", [])
-            tool_call_id = msg.get("tool_call_id", "")
+    for tc in tool_calls or ():
+        if isinstance(tc, dict):
+            tool_name = tc.get("name", "")
+            call_id = tc.get("id", "")
         else:
-            role_map = {"ai": "assistant", "system": "system", "tool": "tool", "human": "user"}
-            role = role_map.get(getattr(msg, "type", "human"), "user")
-            tool_calls = getattr(msg, "tool_calls", [])
-            tool_call_id = getattr(msg, "tool_call_id", "") if hasattr(msg, "tool_call_id") else ""
-        
-        # Добавляем AIMessage с CallManager tool_call
-        if role == "assistant" and tool_calls:
-            for tc in tool_calls:
-                if isinstance(tc, dict):
-                    tool_name = tc.get("name", "")
-                else:
-                    tool_name = getattr(tc, "name", "")
-                
-                if tool_name == "CallManager":
-                    if isinstance(msg, dict):
-                        call_manager_messages.append(msg.copy())
-                    else:
-                        msg_dict = {"role": "assistant", "content": getattr(msg, "content", "")}
-                        if tool_calls:
-                            msg_dict["tool_calls"] = tool_calls
-                        call_manager_messages.append(msg_dict)
-                    break
-        
-        # Добавляем ToolMessage для CallManager
-        if role == "tool" and tool_call_id in call_manager_ids:
-            if isinstance(msg, dict):
-                call_manager_messages.append(msg.copy())
-            else:
-                msg_dict = {
-                    "role": "tool",
-                    "content": getattr(msg, "content", ""),
-                    "tool_call_id": tool_call_id
-                }
-                call_manager_messages.append(msg_dict)
-    
-    return call_manager_messages
+            tool_name = getattr(tc, "name", "")
+            call_id = getattr(tc, "id", "")
+        if tool_name == "CallManager" and call_id:
+            call_manager_ids.add(call_id)
 
 
 def filter_history_for_stage_detector(history: List[Dict[str, Any]], max_messages: int = 10) -> List[Dict[str, Any]]:
@@ -187,19 +165,19 @@ def filter_history_for_stage_detector(history: List[Dict[str, Any]], max_message
     # Сначала берем последние max_messages сообщений
     recent_history = history[-max_messages:] if len(history) > max_messages else history
     
-    # Извлекаем CallManager сообщения только из последних сообщений
-    call_manager_msgs = _extract_call_manager_messages(recent_history)
-    call_manager_ids = {msg.get("tool_call_id") for msg in call_manager_msgs if msg.get("role") == "tool"}
-    
-    # Фильтруем сообщения с role: "tool" (кроме CallManager из последних)
+    # Один проход: ToolMessage всегда идет после сообщения ассистента с его tool_call,
+    # поэтому id вызовов CallManager из последних сообщений известны к моменту проверки
+    call_manager_ids = set()
     filtered_history = []
     for msg in recent_history:
         role = msg.get("role", "user")
-        tool_call_id = msg.get("tool_call_id", "")
         
         # Пропускаем tool сообщения, кроме CallManager из последних
-        if role == "tool" and tool_call_id not in call_manager_ids:
-            continue
+        if role == "tool":
+            if msg.get("tool_call_id", "") not in call_manager_ids:
+                continue
+        elif role == "assistant":
+            _collect_call_manager_ids(msg.get("tool_calls"), call_manager_ids)
         
         filtered_history.append(msg)
     
@@ -232,47 +210,39 @@ def filter_history_conversation_only(messages: List[BaseMessage | Dict[str, Any]
     else:
         recent_messages = messages
     
-    # Извлекаем CallManager сообщения только из последних
-    call_manager_msgs = _extract_call_manager_messages(recent_messages)
-    call_manager_ids = {msg.get("tool_call_id") for msg in call_manager_msgs if msg.get("role") == "tool"}
-    
+    # Один проход: id вызовов CallManager собираются из сообщений ассистента,
+    # которые всегда идут раньше соответствующих ToolMessage
+    call_manager_ids = set()
     history = []
     for msg in recent_messages:
         if isinstance(msg, dict):
             role = msg.get("role", "user")
+            content = msg.get("content", "")
+            tool_calls = msg.get("tool_calls")
             tool_call_id = msg.get("tool_call_id", "")
         else:
-            role_map = {"ai": "assistant", "system": "system", "tool": "tool", "human": "user"}
-            role = role_map.get(getattr(msg, "type", "human"), "user")
-            tool_call_id = getattr(msg, "tool_call_id", "") if hasattr(msg, "tool_call_id") else ""
+            # type и content есть у любого BaseMessage; tool_calls и tool_call_id -
+            # только у сообщений ассистента и инструмента, их читаем по роли
+            role = _ROLE_BY_TYPE.get(msg.type, "user")
+            content = msg.content
+            tool_calls = getattr(msg, "tool_calls", None) if role == "assistant" else None
+            tool_call_id = getattr(msg, "tool_call_id", "") if role == "tool" else ""
         
         # Оставляем user и assistant сообщения
         if role in ("user", "assistant"):
-            if isinstance(msg, dict):
-                msg_dict = {"role": role, "content": msg.get("content", "")}
-                # Сохраняем tool_calls для assistant (включая CallManager)
-                if role == "assistant" and msg.get("tool_calls"):
-                    msg_dict["tool_calls"] = msg.get("tool_calls")
-            else:
-                msg_dict = {"role": role, "content": getattr(msg, "content", "")}
-                if role == "assistant" and hasattr(msg, "tool_calls") and msg.tool_calls:
-                    msg_dict["tool_calls"] = msg.tool_calls
+            msg_dict = {"role": role, "content": content}
+            # Сохраняем tool_calls для assistant (включая CallManager)
+            if role == "assistant" and tool_calls:
+                msg_dict["tool_calls"] = tool_calls
+                _collect_call_manager_ids(tool_calls, call_manager_ids)
             history.append(msg_dict)
         # Оставляем tool сообщения только для CallManager из последних
         elif role == "tool" and tool_call_id in call_manager_ids:
-            if isinstance(msg, dict):
-                msg_dict = {
-                    "role": "tool",
-                    "content": msg.get("content", ""),
-                    "tool_call_id": tool_call_id
-                }
-            else:
-                msg_dict = {
-                    "role": "tool",
-                    "content": getattr(msg, "content", ""),
-                    "tool_call_id": tool_call_id
-                }
-            history.append(msg_dict)
+            history.append({
+                "role": "tool",
+                "content": content,
+                "tool_call_id": tool_call_id
+            })
     
     return history
 
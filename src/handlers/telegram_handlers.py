@@ -75,7 +75,7 @@ async def send_to_agent(message_text, chat_id):
         logger.info("CallManager был вызван из-за критической ошибки")
         return e.escalation_result
     except Exception as e:
-        logger.error("Ошибка при обращении к агенту", str(e))
+        logger.error("Ошибка при обращении к агенту", details=str(e))
         return {"user_message": f"Ошибка при обращении к агенту: {str(e)}"}
 
 
@@ -93,10 +93,10 @@ async def new_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         agent_service = get_agent_service()
         await agent_service.reset_context(chat_id)
-        logger.success("Память полностью очищена", chat_id)
+        logger.success("Память полностью очищена", details=chat_id)
         await update.message.reply_text('Память полностью очищена. Начинаем новый диалог.')
     except Exception as e:
-        logger.error("Ошибка при сбросе контекста", str(e))
+        logger.error("Ошибка при сбросе контекста", details=str(e))
         await update.message.reply_text(f'Ошибка при сбросе контекста: {str(e)}')
 
 
@@ -119,7 +119,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Проверка, что у нас есть текст для обработки
     if not user_message:
-        logger.warning("Получено сообщение без текста", chat_id)
+        logger.warning("Получено сообщение без текста", details=chat_id)
         return
     
     # Получаем админ-сервис
@@ -146,9 +146,9 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
     except TimedOut:
-        logger.warning("Таймаут при отправке send_chat_action, продолжаем обработку", chat_id)
+        logger.warning("Таймаут при отправке send_chat_action, продолжаем обработку", details=chat_id)
     except Exception as e:
-        logger.warning(f"Ошибка при отправке send_chat_action: {e}, продолжаем обработку", chat_id)
+        logger.warning(f"Ошибка при отправке send_chat_action: {e}, продолжаем обработку", details=chat_id)
     
     agent_response = await send_to_agent(user_message, chat_id)
     # Ожидаем словарь: {"user_message": str, "manager_alert": Optional[str], "is_first_message": Optional[bool]}
@@ -1,6 +1,8 @@
 """
 Утилиты для обработки голосовых сообщений
 """
+import asyncio
+import io
 from telegram import Update
 from typing import Optional, Tuple
 from src.services.logger_service import logger
@@ -20,8 +22,10 @@ async def download_voice_to_memory(bot, file_id: str) -> bytes:
     """
     logger.info(f"Начало скачивания голосового сообщения. File ID: {file_id}")
     file = await bot.get_file(file_id)
-    audio_bytearray = await file.download_as_bytearray()
-    audio_bytes = bytes(audio_bytearray)
+    # Скачиваем сразу в BytesIO: download_as_bytearray + bytes() копировали аудио второй раз
+    buffer = io.BytesIO()
+    await file.download_to_memory(out=buffer)
+    audio_bytes = buffer.getvalue()
     logger.info(f"Голосовое сообщение скачано. Размер: {len(audio_bytes)} байт")
     return audio_bytes
 
@@ -54,31 +58,34 @@ async def transcribe_voice_message(
         # Транскрибируем через SpeechKit STT
         try:
             stt_service = get_speechkit_stt_service()
-            transcribed_text = stt_service.transcribe(
+            # transcribe синхронный (HTTP-запрос к STT), выполняем его в потоке,
+            # чтобы не блокировать event loop для других чатов
+            transcribed_text = await asyncio.to_thread(
+                stt_service.transcribe,
                 audio_bytes=audio_bytes,
                 mime_type=mime_type,
                 source="telegram"
             )
             
             if not transcribed_text:
-                logger.warning("Транскрибация вернула пустой текст", chat_id)
+                logger.warning("Транскрибация вернула пустой текст", details=chat_id)
                 return None, "Не удалось распознать речь в аудиосообщении. Попробуйте отправить текстовое сообщение."
             
-            logger.info(f"Транскрибация успешна. Текст: {transcribed_text[:100]}...", chat_id)
+            logger.info(f"Транскрибация успешна. Текст: {transcribed_text[:100]}...", details=chat_id)
             return transcribed_text, None
             
         except SpeechTooLongError as e:
-            logger.warning(f"Голосовое сообщение слишком длинное: {str(e)}", chat_id)
+            logger.warning(f"Голосовое сообщение слишком длинное: {str(e)}", details=chat_id)
             return None, (
                 "Голосовое сообщение слишком длинное (максимум 30 секунд или 1 МБ). "
                 "Попробуйте отправить более короткое сообщение или текстовое сообщение."
             )
         except Exception as e:
-            logger.error(f"Ошибка при транскрибации аудио: {str(e)}", chat_id, exc_info=True)
+            logger.error(f"Ошибка при транскрибации аудио: {str(e)}", details=chat_id, exc_info=True)
             return None, "Произошла ошибка при обработке аудиосообщения. Попробуйте отправить текстовое сообщение."
             
     except Exception as e:
-        logger.error(f"Ошибка при скачивании голосового сообщения: {str(e)}", chat_id, exc_info=True)
+        logger.error(f"Ошибка при скачивании голосового сообщения: {str(e)}", details=chat_id, exc_info=True)
         return None, "Произошла ошибка при скачивании аудиосообщения. Попробуйте отправить текстовое сообщение."
 
 
@@ -1,8 +1,11 @@
 """
 Модуль для работы с LangGraph (OpenAI API)
 """
+import asyncio
 import time
+from contextlib import AsyncExitStack
 from datetime import datetime
+from typing import Any, Optional, Tuple
 import pytz
 
 from langchain_core.messages import HumanMessage
@@ -11,7 +14,9 @@ from .logger_service import logger
 from ..graph.main_graph import create_main_graph
 from .langgraph_service import LangGraphService
 from ..storage.checkpointer import get_postgres_checkpointer, clear_thread_memory
-import requests
+
+# Часовой пояс салона: время считается локально, без запросов к внешним API
+_MOSCOW_TZ = pytz.timezone('Europe/Moscow')
 
 
 class AgentService:
@@ -24,9 +29,15 @@ class AgentService:
         # Ленивая инициализация LangGraph
         self._langgraph_service = None
         
-        # Инициализация кэша времени
+        # Инициализация кэша времени (строка и минута, для которой она посчитана)
         self._time_cache = None
-        self._time_cache_timestamp = 0
+        self._time_cache_minute = None
+        
+        # Скомпилированный граф и checkpointer, общие для всех сообщений (см. _ensure_app)
+        self._app = None
+        self._checkpointer = None
+        self._exit_stack: Optional[AsyncExitStack] = None
+        self._app_lock = asyncio.Lock()
     
     @property
     def langgraph_service(self) -> LangGraphService:
@@ -35,50 +46,58 @@ class AgentService:
             self._langgraph_service = LangGraphService()
         return self._langgraph_service
     
-    def _get_moscow_time(self) -> str:
-        """Получить текущее время и дату в московском часовом поясе через внешний API"""
-        current_time = time.time()
+    async def _ensure_app(self) -> Tuple[Any, Any]:
+        """
+        Возвращает скомпилированный основной граф и его checkpointer
         
-        # Используем кэш, если прошло меньше минуты
-        if self._time_cache and (current_time - self._time_cache_timestamp) < 60:
-            return self._time_cache
+        Checkpointer (и пул соединений PostgreSQL) открывается один раз и живет до aclose(),
+        граф компилируется с ним один раз - вместо нового пула и компиляции на каждое сообщение.
         
+        Returns:
+            Кортеж (скомпилированный граф, checkpointer)
+        """
+        if self._app is None:
+            async with self._app_lock:
+                if self._app is None:
+                    exit_stack = AsyncExitStack()
+                    try:
+                        checkpointer = await exit_stack.enter_async_context(get_postgres_checkpointer())
+                        app = create_main_graph(self.langgraph_service, checkpointer=checkpointer)
+                    except BaseException:
+                        await exit_stack.aclose()
+                        raise
+                    self._exit_stack = exit_stack
+                    self._checkpointer = checkpointer
+                    self._app = app
+                    logger.info("Основной граф скомпилирован, пул соединений checkpointer открыт")
+        return self._app, self._checkpointer
+    
+    async def warm_up(self) -> None:
+        """Открывает пул checkpointer и компилирует граф заранее (при старте приложения)"""
+        await self._ensure_app()
+    
+    async def aclose(self) -> None:
+        """Закрывает пул соединений checkpointer и HTTP-сессию YClients (вызывается при остановке приложения)"""
+        from ..graph.booking.nodes.slot_manager import close_yclients_service
+        exit_stack = self._exit_stack
+        self._app = None
+        self._checkpointer = None
+        self._exit_stack = None
         try:
-            # Получаем точное время через WorldTimeAPI
-            response = requests.get(
-                'http://worldtimeapi.org/api/timezone/Europe/Moscow',
-                timeout=2
-            )
-            response.raise_for_status()
-            data = response.json()
-            datetime_str = data['datetime']
-            
-            # Преобразуем строку в datetime
-            if datetime_str.endswith('Z'):
-                datetime_str = datetime_str[:-1] + '+00:00'
-            moscow_time = datetime.fromisoformat(datetime_str)
-            
-            # Форматируем
-            date_time_str = moscow_time.strftime("%Y-%m-%d %H:%M")
-            result = f"Текущее время: {date_time_str}"
-            
-            # Сохраняем в кэш
-            self._time_cache = result
-            self._time_cache_timestamp = current_time
-            
-            return result
-        except Exception:
-            # Fallback на системное время
-            moscow_tz = pytz.timezone('Europe/Moscow')
-            moscow_time = datetime.now(moscow_tz)
-            date_time_str = moscow_time.strftime("%Y-%m-%d %H:%M")
-            result = f"Текущее время: {date_time_str}"
-            
-            # Кэшируем fallback тоже
-            self._time_cache = result
-            self._time_cache_timestamp = current_time
-            
-            return result
+            await close_yclients_service()
+        finally:
+            if exit_stack is not None:
+                await exit_stack.aclose()
+    
+    def _get_moscow_time(self) -> str:
+        """Получить текущее время и дату в московском часовом поясе"""
+        # Строка содержит время с точностью до минуты, поэтому пересчитываем ее раз в минуту
+        minute = int(time.time() // 60)
+        if self._time_cache_minute != minute:
+            date_time_str = datetime.now(_MOSCOW_TZ).strftime("%Y-%m-%d %H:%M")
+            self._time_cache = f"Текущее время: {date_time_str}"
+            self._time_cache_minute = minute
+        return self._time_cache
     
     async def send_to_agent_langgraph(self, chat_id: str, user_text: str) -> dict:
         """
@@ -100,88 +119,62 @@ class AgentService:
         logger.info(f"Обработка сообщения от chat_id={chat_id}, telegram_user_id={telegram_user_id}")
         
         try:
-            # Используем checkpointer для работы с нативной памятью LangGraph
-            async with get_postgres_checkpointer() as checkpointer:
-                # Создаем граф с checkpointer
-                app = create_main_graph(self.langgraph_service, checkpointer=checkpointer)
-                
-                # Используем ID пользователя как thread_id для изоляции сессий
-                config = {"configurable": {"thread_id": str(telegram_user_id)}}
-                
-                # Пытаемся восстановить предыдущее состояние из checkpointer
-                # чтобы сохранить extracted_info между вызовами
-                previous_extracted_info = None
-                try:
-                    # Получаем последнее состояние из checkpointer
-                    state_snapshot = await checkpointer.aget(config)
-                    if state_snapshot:
-                        previous_values = state_snapshot.values if hasattr(state_snapshot, 'values') else state_snapshot.get('values', {})
-                        previous_extracted_info = previous_values.get("extracted_info")
-                        logger.debug(f"Восстановлено extracted_info из checkpointer: {previous_extracted_info}")
-                except Exception as e:
-                    logger.debug(f"Не удалось восстановить extracted_info из checkpointer: {e}")
-                
-                # Формируем входные данные - ТОЛЬКО новое сообщение
-                # История граф подтянет сам из БД через checkpointer!
-                # extracted_info не передаем, чтобы не перезаписать восстановленное значение
-                input_data = {
-                    "messages": [HumanMessage(content=user_message_text)],
-                    "message": user_message_text,  # Для обратной совместимости с узлами
-                    "chat_id": chat_id,
-                    "stage": None,
-                    # НЕ передаем extracted_info - оно должно восстановиться из checkpointer автоматически
-                    # Если нужно явно установить, используем previous_extracted_info
-                    "answer": "",
-                    "manager_alert": None
-                }
-                
-                # Если удалось восстановить extracted_info, добавляем его в input_data
-                # Это нужно, чтобы LangGraph правильно объединил состояние
-                if previous_extracted_info is not None:
-                    input_data["extracted_info"] = previous_extracted_info
-                
-                # Запускаем граф и обрабатываем поток событий
-                # Используем ainvoke для получения финального состояния
-                # (astream используется для потоковой обработки, но нам нужен финальный результат)
-                final_state = await app.ainvoke(input_data, config)
-                
-                # Извлекаем ответ из финального состояния
-                answer = final_state.get("answer", "")
-                manager_alert = final_state.get("manager_alert")
-                
-                # Проверяем, является ли это первым сообщением, используя messages из final_state
-                # Считаем ВСЕ сообщения от пользователя (включая текущее)
-                messages = final_state.get("messages", [])
-                user_messages_count = 0
-                for msg in messages:
-                    msg_type = getattr(msg, 'type', None) if hasattr(msg, 'type') else msg.get('type', '')
-                    if msg_type in ['human', 'user']:
-                        user_messages_count += 1
-                
-                # Если только одно сообщение от пользователя (текущее), значит это первое сообщение
-                is_first_message = user_messages_count == 1
-                
-                # Получаем текущую дату и время в московском часовом поясе для проверки первого сообщения в день
-                current_datetime = None
-                try:
-                    moscow_tz = pytz.timezone('Europe/Moscow')
-                    current_datetime = datetime.now(moscow_tz)
-                except Exception:
-                    # Если не удалось получить время, передаем None (проверка первого сообщения в день не будет работать)
-                    pass
-                
-                # Форматируем ответ агента
-                from .text_formatter_service import format_agent_response, format_manager_alert
-                
-                answer = format_agent_response(answer, is_first_message, messages, current_datetime)
-                
-                result = {"user_message": answer, "is_first_message": is_first_message}
-                if manager_alert:
-                    manager_alert = format_manager_alert(manager_alert)
-                    result["manager_alert"] = manager_alert
-                
-                return result
-                
+            # Граф и checkpointer (с пулом соединений PostgreSQL) общие для всех сообщений
+            app, _ = await self._ensure_app()
+            
+            # Используем ID пользователя как thread_id для изоляции сессий
+            config = {"configurable": {"thread_id": str(telegram_user_id)}}
+            
+            # Формируем входные данные - ТОЛЬКО изменения этого хода
+            # История, extracted_info и stage граф подтянет сам из БД через checkpointer!
+            # messages, message, chat_id и answer есть в каждом входе, поэтому узлы
+            # MainGraph читают их из состояния напрямую, без .get()
+            input_data = {
+                "messages": [HumanMessage(content=user_message_text)],
+                "message": user_message_text,  # Текущее сообщение, узлы читают его из state["message"]
+                "chat_id": chat_id,
+                # answer и manager_alert сбрасываем: иначе в состоянии останутся значения прошлого хода,
+                # и роутер примет старый manager_alert за вызов CallManager
+                "answer": "",
+                "manager_alert": None
+            }
+            
+            # Запускаем граф и обрабатываем поток событий
+            # Используем ainvoke для получения финального состояния
+            # (astream используется для потоковой обработки, но нам нужен финальный результат)
+            final_state = await app.ainvoke(input_data, config)
+            
+            # Извлекаем ответ из финального состояния
+            answer = final_state.get("answer", "")
+            manager_alert = final_state.get("manager_alert")
+            
+            # Проверяем, является ли это первым сообщением, используя messages из final_state
+            # Считаем ВСЕ сообщения от пользователя (включая текущее)
+            messages = final_state.get("messages", [])
+            user_messages_count = 0
+            for msg in messages:
+                msg_type = getattr(msg, 'type', None) if hasattr(msg, 'type') else msg.get('type', '')
+                if msg_type in ['human', 'user']:
+                    user_messages_count += 1
+            
+            # Если только одно сообщение от пользователя (текущее), значит это первое сообщение
+            is_first_message = user_messages_count == 1
+            
+            # Получаем текущую дату и время в московском часовом поясе для проверки первого сообщения в день
+            current_datetime = datetime.now(_MOSCOW_TZ)
+            
+            # Форматируем ответ агента
+            from .text_formatter_service import format_agent_response, format_manager_alert
+            
+            answer = format_agent_response(answer, is_first_message, messages, current_datetime)
+            
+            result = {"user_message": answer, "is_first_message": is_first_message}
+            if manager_alert:
+                manager_alert = format_manager_alert(manager_alert)
+                result["manager_alert"] = manager_alert
+            
+            return result
+            
         except Exception as e:
             logger.error(f"Ошибка при обработке сообщения через LangGraph: {e}", exc_info=True)
             return {
@@ -43,10 +43,10 @@ class DebugService:
             with open(filename, 'w', encoding='utf-8') as f:
                 json.dump(payload, f, ensure_ascii=False, indent=None, separators=(',', ':'))
             
-            logger.debug("Запрос к LLM сохранен", filename)
+            logger.debug("Запрос к LLM сохранен", details=filename)
             
         except Exception as e:
-            logger.error("Ошибка при сохранении запроса", str(e))
+            logger.error("Ошибка при сохранении запроса", details=str(e))
     
     def save_response(self, response: dict, chat_id: str):
         """Сохранить ответ от LLM в файл для дебага"""
@@ -65,7 +65,7 @@ class DebugService:
             with open(filename, 'w', encoding='utf-8') as f:
                 json.dump(response, f, ensure_ascii=False, indent=None, separators=(',', ':'))
             
-            logger.debug("Ответ от LLM сохранен", filename)
+            logger.debug("Ответ от LLM сохранен", details=filename)
             
         except Exception as e:
-            logger.error("Ошибка при сохранении ответа", str(e))
\ No newline at end of file
+            logger.error("Ошибка при сохранении ответа", details=str(e))
\ No newline at end of file
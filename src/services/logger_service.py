@@ -33,12 +33,45 @@ class Colors:
     BRIGHT_WHITE = '\033[97m'
 
 
+# Числовые уровни логирования (как в стандартном logging, SUCCESS - между INFO и WARNING)
+_LEVELS = {
+    "DEBUG": 10,
+    "INFO": 20,
+    "SUCCESS": 25,
+    "WARNING": 30,
+    "ERROR": 40,
+}
+
+
 class Logger:
     """Красивый логгер для бота"""
     
     def __init__(self, name: str = "Bot"):
         self.name = name
         self.enable_colors = self._should_enable_colors()
+        # Порог уровня определяется при первой записи: .env может загружаться после импорта модуля
+        self._threshold: Optional[int] = None
+    
+    def _get_threshold(self) -> int:
+        """
+        Минимальный выводимый уровень
+        
+        LOG_LEVEL (DEBUG/INFO/SUCCESS/WARNING/ERROR) задает порог явно. Без него
+        DEBUG=true включает отладочные сообщения, иначе выводится INFO и выше.
+        """
+        if self._threshold is None:
+            level_name = os.getenv("LOG_LEVEL", "").upper()
+            if level_name in _LEVELS:
+                self._threshold = _LEVELS[level_name]
+            elif os.getenv("DEBUG", "false").lower() == "true":
+                self._threshold = _LEVELS["DEBUG"]
+            else:
+                self._threshold = _LEVELS["INFO"]
+        return self._threshold
+    
+    def is_enabled_for(self, level: str) -> bool:
+        """Проверяет, будет ли выведено сообщение уровня level"""
+        return _LEVELS[level] >= self._get_threshold()
     
     def _should_enable_colors(self) -> bool:
         """Проверяет, поддерживает ли терминал цвета"""
@@ -57,8 +90,27 @@ class Logger:
             return f"{color}{text}{Colors.RESET}"
         return text
     
-    def _log(self, level: str, emoji: str, color: str, message: str, details: Optional[str] = None, use_stderr: bool = False):
+    @staticmethod
+    def _render(message: str, args: tuple) -> str:
+        """
+        Подставляет аргументы в сообщение в стиле стандартного logging ("... %s", value).
+        
+        Вызывается только для сообщений, которые проходят порог уровня. Позиционные
+        аргументы - всегда аргументы форматирования, details передается только по имени.
+        Если аргументы не подходят к шаблону, они выводятся после сообщения как есть.
+        """
+        if not args:
+            return message
+        try:
+            return message % args
+        except (TypeError, ValueError):
+            return f"{message} {args!r}"
+    
+    def _log(self, level: str, emoji: str, color: str, message: str, details: Optional[str] = None, use_stderr: bool = False, args: tuple = ()):
         """Базовый метод логирования"""
+        if _LEVELS[level] < self._get_threshold():
+            return
+        message = self._render(message, args)
         timestamp = self._format_time()
         level_colored = self._colorize(f"[{level}]", color)
         emoji_colored = self._colorize(emoji, color)
@@ -75,34 +127,36 @@ class Logger:
         output_stream = sys.stderr if use_stderr else sys.stdout
         print(main_msg, file=output_stream, flush=True)
     
-    def info(self, message: str, details: Optional[str] = None):
+    def info(self, message: str, *args, details: Optional[str] = None):
         """Информационное сообщение"""
-        self._log("INFO", "ℹ️", Colors.BLUE, message, details)
+        self._log("INFO", "ℹ️", Colors.BLUE, message, details, args=args)
     
-    def success(self, message: str, details: Optional[str] = None):
+    def success(self, message: str, *args, details: Optional[str] = None):
         """Сообщение об успехе"""
-        self._log("SUCCESS", "✅", Colors.GREEN, message, details)
+        self._log("SUCCESS", "✅", Colors.GREEN, message, details, args=args)
     
-    def warning(self, message: str, details: Optional[str] = None):
+    def warning(self, message: str, *args, details: Optional[str] = None):
         """Предупреждение"""
-        self._log("WARNING", "⚠️", Colors.YELLOW, message, details, use_stderr=True)
+        self._log("WARNING", "⚠️", Colors.YELLOW, message, details, use_stderr=True, args=args)
     
-    def error(self, message: str, details: Optional[str] = None, exc_info: bool = False):
+    def error(self, message: str, *args, details: Optional[str] = None, exc_info: bool = False):
         """Ошибка - выводится в stderr для гарантированной видимости"""
-        self._log("ERROR", "❌", Colors.RED, message, details, use_stderr=True)
-        if exc_info:
+        self._log("ERROR", "❌", Colors.RED, message, details, use_stderr=True, args=args)
+        if exc_info and self.is_enabled_for("ERROR"):
             # Выводим traceback в stderr
             traceback.print_exc(file=sys.stderr)
     
-    def debug(self, message: str, details: Optional[str] = None):
-        """Отладочное сообщение (только если включен DEBUG режим)"""
-        if os.getenv("DEBUG", "false").lower() == "true":
-            self._log("DEBUG", "🐛", Colors.MAGENTA, message, details)
+    def debug(self, message: str, *args, details: Optional[str] = None, exc_info: bool = False):
+        """Отладочное сообщение (только если включен DEBUG режим или LOG_LEVEL=DEBUG)"""
+        if self.is_enabled_for("DEBUG"):
+            self._log("DEBUG", "🐛", Colors.MAGENTA, message, details, args=args)
+            if exc_info:
+                traceback.print_exc(file=sys.stderr)
     
     def telegram(self, action: str, chat_id: Optional[str] = None):
         """Логирование действий Telegram бота"""
         if chat_id:
-            self.info(f"Telegram: {action}", f"chat_id={chat_id}")
+            self.info(f"Telegram: {action}", details=f"chat_id={chat_id}")
         else:
             self.info(f"Telegram: {action}")
     
@@ -115,12 +169,12 @@ class Logger:
             details_parts.append(f"id={response_id[:8]}...")
         
         details = ", ".join(details_parts) if details_parts else None
-        self.info(f"API: {action}", details)
+        self.info(f"API: {action}", details=details)
     
     def ydb(self, action: str, chat_id: Optional[str] = None):
         """Логирование операций с YDB"""
         if chat_id:
-            self.info(f"YDB: {action}", f"chat_id={chat_id}")
+            self.info(f"YDB: {action}", details=f"chat_id={chat_id}")
         else:
             self.info(f"YDB: {action}")
     
@@ -133,7 +187,7 @@ class Logger:
             details_parts.append(f"context={context}")
         
         details = ", ".join(details_parts) if details_parts else None
-        self.info(f"Agent: {action}", details)
+        self.info(f"Agent: {action}", details=details)
 
 
 # Глобальный экземпляр логгера
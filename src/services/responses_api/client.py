@@ -1,6 +1,7 @@
 """
 Клиент для работы с OpenAI API (cloud.ru)
 """
+import functools
 import json
 import re
 import time
@@ -14,6 +15,40 @@ from ..logger_service import logger
 # Валидные роли для OpenAI API
 VALID_ROLES = {"system", "user", "assistant", "tool"}
 
+_SPACES_RE = re.compile(r'[ \t]+')
+_EXTRA_BLANK_LINES_RE = re.compile(r'\n{3,}')
+_CONTROL_CHARS_RE = re.compile(r'[\x00-\x08\x0B-\x0C\x0E-\x1F\x7F]')
+
+
+@functools.lru_cache(maxsize=1024)
+def _normalize_str(text: str) -> str:
+    """
+    Нормализация строки (см. ResponsesAPIClient._normalize_text)
+    
+    Результат кэшируется: системные промпты агентов и сообщения истории повторяются
+    от хода к ходу, а одинаковый результат нормализации дает провайдеру побайтно
+    стабильный префикс запроса для кэширования промпта на его стороне.
+    """
+    # Убираем нулевые байты и другие проблемные символы
+    text = text.replace('\x00', '')
+    
+    # Нормализуем переносы строк
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    
+    # Убираем множественные пробелы (но сохраняем переносы строк)
+    text = _SPACES_RE.sub(' ', text)
+    
+    # Убираем пробелы в начале и конце каждой строки
+    text = '\n'.join(line.strip() for line in text.split('\n'))
+    
+    # Убираем множественные пустые строки
+    text = _EXTRA_BLANK_LINES_RE.sub('\n\n', text)
+    
+    # Убираем управляющие символы, кроме стандартных (табуляция, перенос строки)
+    text = _CONTROL_CHARS_RE.sub('', text)
+    
+    return text.strip()
+
 
 class ResponsesAPIClient:
     """Клиент для работы с OpenAI API"""
@@ -37,27 +72,7 @@ class ResponsesAPIClient:
         if not isinstance(text, str):
             text = str(text) if text is not None else ""
         
-        # Убираем нулевые байты и другие проблемные символы
-        text = text.replace('\x00', '')
-        
-        # Нормализуем переносы строк
-        text = text.replace('\r\n', '\n').replace('\r', '\n')
-        
-        # Убираем множественные пробелы (но сохраняем переносы строк)
-        text = re.sub(r'[ \t]+', ' ', text)
-        
-        # Убираем пробелы в начале и конце каждой строки
-        lines = text.split('\n')
-        lines = [line.strip() for line in lines]
-        text = '\n'.join(lines)
-        
-        # Убираем множественные пустые строки
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        
-        # Убираем управляющие символы, кроме стандартных (табуляция, перенос строки)
-        text = re.sub(r'[\x00-\x08\x0B-\x0C\x0E-\x1F\x7F]', '', text)
-        
-        return text.strip()
+        return _normalize_str(text)
     
     def _validate_and_normalize_role(self, role: Any) -> str:
         """
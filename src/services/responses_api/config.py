@@ -23,6 +23,11 @@ class ResponsesAPIConfig:
         self.temperature = 0.1
         self.top_p = 0.95
         self.presence_penalty = 0
+        
+        # Выполнять несколько tool_calls из одного ответа модели параллельно.
+        # Включать только для узлов, инструменты которых независимы друг от друга (чтение данных).
+        # Ответ модели с CallManager оркестратор все равно выполняет последовательно
+        self.parallel_tools = False
     
     @property
     def project(self) -> str:
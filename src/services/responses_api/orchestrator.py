@@ -2,19 +2,30 @@
 Orchestrator для обработки диалогов через OpenAI API
 """
 import json
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 from langchain_core.messages import BaseMessage
 from .client import ResponsesAPIClient
 from .tools_registry import ResponsesToolsRegistry
 from .config import ResponsesAPIConfig
 from ..logger_service import logger
 
+# Аргументы tool_calls разбираем через orjson, если он установлен (приходит с langchain-core).
+# orjson.JSONDecodeError - подкласс json.JSONDecodeError, поэтому обработка ошибок общая
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
 # Импортируем CallManagerException один раз, а не в цикле
 try:
     from ...agents.tools.call_manager import CallManagerException
 except ImportError:
     CallManagerException = None
 
+# Имя инструмента эскалации: после него остальные вызовы из ответа модели не выполняются
+_CALL_MANAGER_TOOL = "CallManager"
+
 
 class ResponsesOrchestrator:
     """Orchestrator для обработки диалогов через OpenAI API"""
@@ -36,6 +47,25 @@ class ResponsesOrchestrator:
         self.client = client or ResponsesAPIClient(self.config)
         self.agent_name = agent_name
     
+    def _execute_tool_call(
+        self,
+        func_name: str,
+        args: Dict[str, Any],
+        chat_id: Optional[str],
+    ) -> Tuple[Any, Optional[Exception]]:
+        """
+        Выполняет один вызов инструмента
+        
+        Returns:
+            Кортеж (результат, исключение). CallManagerException возвращается как исключение без логирования
+        """
+        try:
+            return self.tools_registry.call_tool(func_name, args, conversation_history=None, chat_id=chat_id), None
+        except Exception as e:
+            if not (CallManagerException and isinstance(e, CallManagerException)):
+                logger.error(f"Ошибка при вызове инструмента {func_name}: {e}", exc_info=True)
+            return None, e
+    
     def run_turn(
         self,
         user_message: str,
@@ -197,23 +227,44 @@ class ResponsesOrchestrator:
             
             # Проверяем tool_calls
             if message.tool_calls:
+                planned_calls = []
                 for tool_call in message.tool_calls:
                     func_name = tool_call.function.name
                     call_id = tool_call.id
                     args_json = tool_call.function.arguments
                     
                     try:
-                        args = json.loads(args_json)
+                        args = _json_loads(args_json)
                     except json.JSONDecodeError:
                         logger.error(f"Ошибка парсинга аргументов для {func_name}: {args_json}")
                         args = {}
                     
                     logger.info(f"🔧 Использован инструмент: {func_name}")
                     logger.info(f"📋 Аргументы: {json.dumps(args, ensure_ascii=False, indent=2)}")
-                    
-                    try:
-                        result = self.tools_registry.call_tool(func_name, args, conversation_history=None, chat_id=chat_id)
-                        
+                    planned_calls.append((func_name, call_id, args))
+                
+                # Независимые вызовы из одного ответа модели выполняем параллельно (если включено),
+                # иначе - последовательно и лениво, чтобы после CallManager не выполнять остальные.
+                # Ответ с CallManager всегда выполняется последовательно: параллельно остальные
+                # инструменты успели бы выполниться, хотя их результаты будут отброшены
+                run_parallel = (
+                    self.config.parallel_tools
+                    and len(planned_calls) > 1
+                    and all(func_name != _CALL_MANAGER_TOOL for func_name, _, _ in planned_calls)
+                )
+                if run_parallel:
+                    logger.info(f"Параллельное выполнение {len(planned_calls)} инструментов")
+                    with ThreadPoolExecutor(max_workers=len(planned_calls)) as executor:
+                        outcomes = list(executor.map(
+                            lambda planned: self._execute_tool_call(planned[0], planned[2], chat_id),
+                            planned_calls
+                        ))
+                else:
+                    outcomes = (self._execute_tool_call(func_name, args, chat_id) for func_name, _, args in planned_calls)
+                
+                # Результаты добавляем строго в порядке tool_calls из ответа модели
+                for (func_name, call_id, args), (result, error) in zip(planned_calls, outcomes):
+                    if error is None:
                         tool_call_info = {
                             "name": func_name,
                             "call_id": call_id,
@@ -228,55 +279,54 @@ class ResponsesOrchestrator:
                             "tool_call_id": call_id,
                             "content": json.dumps(result, ensure_ascii=False) if not isinstance(result, str) else result
                         })
+                        continue
+                    
+                    # Проверяем CallManager
+                    if CallManagerException and isinstance(error, CallManagerException):
+                        escalation_result = error.escalation_result
+                        logger.info(f"CallManager вызван через инструмент {func_name}")
                         
-                    except Exception as e:
-                        # Проверяем CallManager
-                        if CallManagerException and isinstance(e, CallManagerException):
-                            escalation_result = e.escalation_result
-                            logger.info(f"CallManager вызван через инструмент {func_name}")
-                            
-                            # ВАЖНО: Добавляем ToolMessage с результатом CallManager в messages
-                            # Это нужно для сохранения в истории LangGraph
-                            call_manager_tool_message = {
-                                "role": "tool",
-                                "tool_call_id": call_id,
-                                "content": json.dumps({
-                                    "call_manager": True,
-                                    "reason": args.get("reason", ""),
-                                    "manager_alert": escalation_result.get("manager_alert", "")
-                                }, ensure_ascii=False)
-                            }
-                            messages.append(call_manager_tool_message)
-                            
-                            # Извлекаем новые сообщения (включая AIMessage с tool_calls и ToolMessage)
-                            # Исключаем user_message, так как он уже есть в state["messages"]
-                            # Если user_message был добавлен, начинаем с history_length + 1, иначе с history_length
-                            start_index = history_length + 1 if user_message_added else history_length
-                            new_messages = messages[start_index:] if len(messages) > start_index else []
-                            return {
-                                "reply": escalation_result.get("user_message"),
-                                "tool_calls": tool_calls_info,
+                        # ВАЖНО: Добавляем ToolMessage с результатом CallManager в messages
+                        # Это нужно для сохранения в истории LangGraph
+                        call_manager_tool_message = {
+                            "role": "tool",
+                            "tool_call_id": call_id,
+                            "content": json.dumps({
                                 "call_manager": True,
-                                "manager_alert": escalation_result.get("manager_alert"),
-                                "new_messages": new_messages,  # КРИТИЧНО: Все новые сообщения (AIMessage + ToolMessage)
-                            }
-                        
-                        logger.error(f"Ошибка при вызове инструмента {func_name}: {e}", exc_info=True)
-                        error_result = f"Ошибка при выполнении инструмента: {str(e)}"
-                        
-                        tool_call_info = {
-                            "name": func_name,
-                            "call_id": call_id,
-                            "args": args,
-                            "result": error_result,
+                                "reason": args.get("reason", ""),
+                                "manager_alert": escalation_result.get("manager_alert", "")
+                            }, ensure_ascii=False)
                         }
-                        tool_calls_info.append(tool_call_info)
+                        messages.append(call_manager_tool_message)
                         
-                        messages.append({
-                            "role": "tool",
-                            "tool_call_id": call_id,
-                            "content": error_result
-                        })
+                        # Извлекаем новые сообщения (включая AIMessage с tool_calls и ToolMessage)
+                        # Исключаем user_message, так как он уже есть в state["messages"]
+                        # Если user_message был добавлен, начинаем с history_length + 1, иначе с history_length
+                        start_index = history_length + 1 if user_message_added else history_length
+                        new_messages = messages[start_index:] if len(messages) > start_index else []
+                        return {
+                            "reply": escalation_result.get("user_message"),
+                            "tool_calls": tool_calls_info,
+                            "call_manager": True,
+                            "manager_alert": escalation_result.get("manager_alert"),
+                            "new_messages": new_messages,  # КРИТИЧНО: Все новые сообщения (AIMessage + ToolMessage)
+                        }
+                    
+                    error_result = f"Ошибка при выполнении инструмента: {str(error)}"
+                    
+                    tool_call_info = {
+                        "name": func_name,
+                        "call_id": call_id,
+                        "args": args,
+                        "result": error_result,
+                    }
+                    tool_calls_info.append(tool_call_info)
+                    
+                    messages.append({
+                        "role": "tool",
+                        "tool_call_id": call_id,
+                        "content": error_result
+                    })
                 
                 # Продолжаем цикл, чтобы модель могла ответить на результаты инструментов
                 continue
@@ -13,6 +13,8 @@ class ResponsesToolsRegistry:
     def __init__(self):
         self._local_functions: Dict[str, Callable[..., Any]] = {}
         self._tool_classes: Dict[str, type] = {}
+        # Схемы инструментов строятся один раз и сбрасываются при регистрации нового инструмента
+        self._schemas_cache: Optional[List[Dict[str, Any]]] = None
     
     def register_tool(self, tool_class: type):
         """
@@ -35,6 +37,7 @@ class ResponsesToolsRegistry:
             return
         
         self._tool_classes[tool_name] = tool_class
+        self._schemas_cache = None
         
         # Создаём обёртку для вызова инструмента
         def tool_wrapper(**kwargs):
@@ -198,9 +201,16 @@ class ResponsesToolsRegistry:
         """
         Получение схем всех зарегистрированных инструментов
         
+        Схемы кэшируются в реестре: реестры узлов создаются один раз на модуль,
+        поэтому model_json_schema не вызывается на каждом ходе диалога.
+        Возвращаемый список нельзя изменять.
+        
         Returns:
             Список схем инструментов в формате OpenAI function tools
         """
+        if self._schemas_cache is not None:
+            return self._schemas_cache
+        
         schemas = []
         for tool_name, tool_class in self._tool_classes.items():
             try:
@@ -209,6 +219,7 @@ class ResponsesToolsRegistry:
             except Exception as e:
                 logger.error(f"Ошибка при получении схемы для {tool_name}: {e}")
         
+        self._schemas_cache = schemas
         return schemas
     
     def get_registered_tools(self) -> List[str]:
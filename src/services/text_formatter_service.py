@@ -4,13 +4,58 @@
 """
 from typing import Optional, List, Any
 from datetime import datetime
-from .date_normalizer import normalize_dates_in_text
-from .time_normalizer import normalize_times_in_text
+import re
+from .date_normalizer import DateNormalizer
 from .link_converter import convert_markdown_links_in_text
 from .text_formatter import convert_bold_markdown_to_html
 from .id_cleaner import remove_id_brackets_from_text
 from .greeting_handler import add_greeting_if_needed
 
+# Даты и время нормализуются за один проход по тексту: шаблоны DateNormalizer
+# (в том же порядке) и TimeNormalizer объединены в одно регулярное выражение
+_DASH = r'[\u002D\u2010\u2011\u2013\u2014\-]'
+_DATE_TIME_RE = re.compile(
+    rf'(?P<ymd>(\d{{4}}){_DASH}(\d{{1,2}}){_DASH}(\d{{1,2}}))'
+    r'|(?P<dmy_dot>(\d{1,2})\.(\d{1,2})\.(\d{4}))'
+    r'|(?P<dmy_slash>(\d{1,2})/(\d{1,2})/(\d{4}))'
+    r'|(?P<ymd_dot>(\d{4})\.(\d{1,2})\.(\d{1,2}))'
+    r'|(?P<time>(\d{1,2})\s*:\s*(\d{2}))'
+)
+
+
+def _normalize_date_time_match(match: re.Match) -> str:
+    """Заменяет найденную дату на "DD месяца", время - на "HH:MM" (невалидные значения не меняются)"""
+    kind = match.lastgroup
+    # Номера групп компонентов идут сразу за именованной группой
+    index = match.re.groupindex[kind]
+    if kind == "time":
+        hours, minutes = int(match.group(index + 1)), int(match.group(index + 2))
+        if 0 <= hours <= 23 and 0 <= minutes <= 59:
+            return f"{hours:02d}:{minutes:02d}"
+        return match.group(0)
+    
+    first, second, third = (int(match.group(index + i)) for i in (1, 2, 3))
+    if kind in ("ymd", "ymd_dot"):
+        formatted = DateNormalizer._format_date(first, second, third)
+    else:
+        formatted = DateNormalizer._format_date(third, second, first)
+    return formatted if formatted is not None else match.group(0)
+
+
+def normalize_dates_and_times_in_text(text: str) -> str:
+    """
+    Нормализует даты ("DD месяца") и время ("HH:MM") в тексте за один проход
+    
+    Args:
+        text: Исходный текст
+        
+    Returns:
+        Текст с нормализованными датами и временем
+    """
+    if not text:
+        return text
+    return _DATE_TIME_RE.sub(_normalize_date_time_match, text)
+
 
 class TextFormatterService:
     """Сервис для форматирования текста ответов агента"""
@@ -38,8 +83,7 @@ class TextFormatterService:
             return text
         
         # Нормализуем даты и время
-        text = normalize_dates_in_text(text)
-        text = normalize_times_in_text(text)
+        text = normalize_dates_and_times_in_text(text)
         
         # Преобразуем Markdown ссылки [текст](ссылка) в HTML-гиперссылки
         text = convert_markdown_links_in_text(text)
@@ -70,8 +114,7 @@ class TextFormatterService:
             return text
         
         # Нормализуем даты и время
-        text = normalize_dates_in_text(text)
-        text = normalize_times_in_text(text)
+        text = normalize_dates_and_times_in_text(text)
         
         # Преобразуем Markdown ссылки [текст](ссылка) в HTML-гиперссылки
         text = convert_markdown_links_in_text(text)
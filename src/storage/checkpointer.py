@@ -156,8 +156,8 @@ async def get_postgres_checkpointer() -> AsyncGenerator[AsyncPostgresSaver, None
     """
     Асинхронный контекстный менеджер для получения AsyncPostgresSaver.
     
-    Создает пул соединений и инициализирует checkpointer.
-    Таблицы должны быть созданы вручную через SQL.
+    Создает пул соединений и инициализирует checkpointer. Пул закрывается при выходе
+    из контекста. Таблицы должны быть созданы вручную через SQL.
     
     Yields:
         AsyncPostgresSaver: Экземпляр checkpointer для LangGraph
@@ -173,7 +173,13 @@ async def get_postgres_checkpointer() -> AsyncGenerator[AsyncPostgresSaver, None
     connection_string = _get_connection_string()
     
     # Создаем пул соединений
-    pool = AsyncConnectionPool(conninfo=connection_string, open=False)
+    # Пул может жить весь процесс (см. AgentService._ensure_app), поэтому соединение
+    # проверяется перед выдачей: разорванное сервером за время простоя заменяется новым
+    pool = AsyncConnectionPool(
+        conninfo=connection_string,
+        open=False,
+        check=AsyncConnectionPool.check_connection
+    )
     await pool.open()
     
     try:
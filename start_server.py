@@ -84,6 +84,18 @@ except Exception as e:
     print(traceback.format_exc(), flush=True)
     sys.exit(1)
 
+# Event loop: uvloop (ставится вместе с uvicorn[standard]) быстрее стандартного asyncio
+# на сетевых операциях (YClients, LLM, Postgres). На Windows uvloop не поддерживается
+print("\n🔍 Проверка uvloop...", flush=True)
+event_loop = "asyncio"
+if sys.platform != 'win32':
+    try:
+        import uvloop
+        event_loop = "uvloop"
+        print(f"✅ uvloop импортирован, версия: {uvloop.__version__}", flush=True)
+    except ImportError:
+        print("⚠️ uvloop не установлен, используется стандартный asyncio", flush=True)
+
 print("\n" + "=" * 80, flush=True)
 print("✅ ВСЕ ПРОВЕРКИ ПРОЙДЕНЫ, ЗАПУСКАЕМ UVICORN", flush=True)
 print("=" * 80 + "\n", flush=True)
@@ -94,6 +106,7 @@ try:
         "main:app",
         host="0.0.0.0",
         port=8080,
+        loop=event_loop,
         log_level="info",
         access_log=True
     )
@@ -0,0 +1,34 @@
+"""
+Проверка доступности времени по слотам мастера (slot_manager._is_time_in_slots)
+"""
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("langchain_core")
+pytest.importorskip("langgraph")
+
+from src.agents.tools.common.book_times_logic import _merge_consecutive_slots
+from src.graph.booking.nodes.slot_manager import _hhmm, _is_time_in_slots
+
+
+@pytest.mark.parametrize("time_str", ["10:00", "10:30", "11:30", "12:00", "15:00"])
+def test_grid_times_inside_interval_are_bookable(time_str):
+    assert _is_time_in_slots(["10:00-12:00", "15:00"], _hhmm(time_str))
+
+
+@pytest.mark.parametrize("time_str", ["09:30", "10:15", "11:59", "12:30", "15:30"])
+def test_off_grid_and_outside_times_are_rejected(time_str):
+    assert not _is_time_in_slots(["10:00-12:00", "15:00"], _hhmm(time_str))
+
+
+def test_interval_end_is_the_last_merged_start():
+    # Конец интервала - последнее свободное начало записи, а не время окончания
+    slots = _merge_consecutive_slots(["10:00", "10:30", "11:00", "14:00"])
+    assert slots == ["10:00-11:00", "14:00"]
+    assert _is_time_in_slots(slots, _hhmm("11:00"))
+    assert not _is_time_in_slots(slots, _hhmm("11:30"))
+
+
+def test_unsorted_and_loose_slot_formats():
+    assert _is_time_in_slots(["15:00", "9:00 - 10:00"], _hhmm("09:30"))
+    assert not _is_time_in_slots([], _hhmm("10:00"))